@@ -0,0 +1,103 @@
+# alocacao.py
+"""
+Alocação de colaboradores a setores que maximiza a soma dos overalls.
+
+É um problema de transporte: cada pessoa vai para um setor, cada setor tem um limite de
+vagas e o valor de pôr a pessoa i no setor s é o seu overall simulado nesse setor.
+Resolve-se com caminhos aumentantes sucessivos (min-cost flow), acrescentando uma pessoa
+de cada vez. Como há poucos setores, o grafo residual é comprimido para os setores: a
+aresta a -> b vale o melhor ganho de mover alguém de a para b, e esse melhor ganho sai
+de um heap por par de setores. Cada pessoa custa um Bellman-Ford sobre os setores, por
+isso milhares de pessoas resolvem-se em menos de um segundo.
+
+Um setor fictício sem limite e com valor 0 recebe quem não couber nas vagas.
+"""
+import heapq
+
+import numpy as np
+
+
+def alocar(valores, capacidades, fixados=None):
+    """
+    valores: matriz N x S (overall da pessoa i no setor s).
+    capacidades: S inteiros (vagas por setor).
+    fixados: {i: s} pessoas que têm de ficar no setor s.
+    Devolve (lista com o setor de cada pessoa ou None se ficou sem vaga, soma dos valores).
+    """
+    valores = np.asarray(valores, dtype=float)
+    n, num_setores = valores.shape
+    if len(capacidades) != num_setores: raise ValueError("É preciso uma capacidade por setor.")
+    fixados = fixados or {}
+    ficticio = num_setores
+    num_nos = num_setores + 1
+    # Coluna extra com o setor fictício (valor 0, vagas ilimitadas)
+    v = np.hstack([valores, np.zeros((n, 1))])
+    vagas = [int(c) for c in capacidades] + [n + 1]
+    ocupados = [0] * num_nos
+    setor_de = [None] * n
+    movel = [True] * n
+
+    for i, s in fixados.items():
+        if not 0 <= s < num_setores: raise ValueError(f"Setor inválido para a pessoa {i}.")
+        setor_de[i], movel[i] = s, False
+        ocupados[s] += 1
+    excedidos = [s for s in range(num_setores) if ocupados[s] > vagas[s]]
+    if excedidos: raise ValueError(f"Há mais pessoas fixadas do que vagas nos setores {excedidos}.")
+
+    # heaps[a][b]: (-(v[p,b] - v[p,a]), p) para as pessoas móveis em a; entradas antigas são
+    # descartadas ao espreitar o topo (a pessoa já não está em a).
+    heaps = [[[] for _ in range(num_nos)] for _ in range(num_nos)]
+
+    def colocar(p, s):
+        setor_de[p] = s
+        ocupados[s] += 1
+        linha = v[p]
+        for b in range(num_nos):
+            if b != s: heapq.heappush(heaps[s][b], (linha[s] - linha[b], p))
+
+    def topo(a, b):
+        heap = heaps[a][b]
+        while heap and setor_de[heap[0][1]] != a: heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    ganhos = np.full((num_nos, num_nos), -np.inf)
+    # Mais valiosos primeiro: menos reajustes pelo caminho
+    ordem = sorted((i for i in range(n) if movel[i]), key=lambda i: -v[i].max())
+    for i in ordem:
+        # Grafo residual comprimido: melhor ganho de mover alguém de a para b
+        for a in range(num_nos):
+            if not ocupados[a]:
+                ganhos[a].fill(-np.inf)
+                continue
+            for b in range(num_nos):
+                if a == b: continue
+                entrada = topo(a, b)
+                ganhos[a, b] = -entrada[0] if entrada else -np.inf
+
+        # Bellman-Ford (maior ganho) a partir da pessoa nova; o invariante do algoritmo garante
+        # que não há ciclos de ganho positivo, logo num_nos rondas bastam.
+        distancia = v[i].copy()
+        anterior = np.full(num_nos, -1)
+        for _ in range(num_nos):
+            candidatos = distancia[:, None] + ganhos
+            origem = candidatos.argmax(axis=0)
+            melhor = candidatos[origem, np.arange(num_nos)]
+            melhorou = melhor > distancia + 1e-9
+            if not melhorou.any(): break
+            distancia[melhorou] = melhor[melhorou]
+            anterior[melhorou] = origem[melhorou]
+
+        livres = [s for s in range(num_nos) if ocupados[s] < vagas[s]]
+        destino = max(livres, key=lambda s: distancia[s])
+        # Percorre o caminho ao contrário: cada passo move o melhor de "a" para "destino"
+        while anterior[destino] != -1:
+            a = int(anterior[destino])
+            p = topo(a, destino)[1]
+            ocupados[a] -= 1
+            colocar(p, destino)
+            destino = a
+        colocar(i, destino)
+
+    alocacao = [None if s == ficticio else s for s in setor_de]
+    total = float(sum(valores[i, s] for i, s in enumerate(alocacao) if s is not None))
+    return alocacao, total
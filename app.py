@@ -1,14 +1,37 @@
+import time
+_inicio_importacao = time.perf_counter()
 import pandas as pd
+import numpy as np
 import json
+import hashlib
+import heapq
+import importlib.util
+import io
 import os
-import time
+import re
+import sys
+import threading
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Sequence
 from unidecode import unidecode
-from flask import Flask, jsonify, render_template, request, url_for, redirect, send_from_directory
-from datetime import datetime 
+from flask import Flask, Response, g, jsonify, render_template, request, url_for, redirect, send_file, before_render_template, template_rendered
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache, wraps
+from itertools import accumulate
+from html import escape
+from markupsafe import Markup
+from urllib.parse import quote
+from werkzeug.security import safe_join
 import traceback
-import cloudinary
-import cloudinary.uploader
 from dotenv import load_dotenv
+from armazenamento import COLUNA_ID, SEM_ALTERACAO, ArmazenamentoArquivos, ArmazenamentoSQLite, bloqueio_arquivo, escrever_atomico
+from fila_uploads import EnvioLocal, FilaUploads
+from alocacao import alocar
+from snapshot_partilhado import SnapshotPartilhado
+import metricas
+from metricas import medir
 
 # Carrega as variáveis de ambiente
 load_dotenv()
@@ -16,20 +39,18 @@ load_dotenv()
 # Inicialização da aplicação Flask
 app = Flask(__name__)
 
-# --- CONFIGURAÇÃO DO CLOUDINARY ---
-cloudinary.config(
-    cloud_name = os.getenv('CLOUD_NAME'),
-    api_key = os.getenv('API_KEY'),
-    api_secret = os.getenv('API_SECRET')
-)
-
 # --- CONFIGURAÇÕES E CONSTANTES GLOBAIS ---
 ARQUIVO_COLABORADORES = 'Colaboradores.xlsx'
 ARQUIVO_AVALIACOES = 'avaliacoes.json'
 ARQUIVO_INSIGNIAS = 'insignias_colaboradores.json'
 ARQUIVO_PDI = 'pdi_colaboradores.json'
 ARQUIVO_HISTORICO = 'historico_avaliacoes.json'
+ARQUIVO_HISTORICO_LOG = 'historico_avaliacoes.jsonl'
 ARQUIVO_MUDANCAS_SETOR = 'mudancas_setor.json'
+ARQUIVO_SQLITE = 'carometro.db'
+PASTA_UPLOADS_PENDENTES = 'uploads_pendentes'
+MAX_IDS_OVERALL_LOTE = 2000
+MAX_RESULTADOS_BUSCA = 100
 
 
 # Estrutura de Atributos e Sub-atributos
@@ -75,37 +96,226 @@ INSIGNIAS_DISPONIVEIS = {
     "consistencia": {"icone": "fa-solid fa-calendar-check", "titulo": "Consistência", "descricao": "Exemplo de regularidade, presença e pontualidade."}
 }
 
+# --- ARMAZENAMENTO ---
+# CAROMETRO_ARMAZENAMENTO=sqlite usa a base SQLite (importe antes com migrar_para_sqlite.py);
+# por omissão continuam a ser usados o Colaboradores.xlsx e os ficheiros JSON.
+def criar_armazenamento():
+    if os.getenv('CAROMETRO_ARMAZENAMENTO', 'arquivos').lower() == 'sqlite':
+        return ArmazenamentoSQLite(os.getenv('CAROMETRO_SQLITE', ARQUIVO_SQLITE))
+    return ArmazenamentoArquivos(ARQUIVO_COLABORADORES, {
+        'avaliacoes': ARQUIVO_AVALIACOES, 'historico': ARQUIVO_HISTORICO, 'historico_log': ARQUIVO_HISTORICO_LOG, 'pdi': ARQUIVO_PDI,
+        'insignias': ARQUIVO_INSIGNIAS, 'mudancas_setor': ARQUIVO_MUDANCAS_SETOR
+    })
+
+armazenamento = criar_armazenamento()
+
+# --- FILA DE UPLOADS DE FOTOS ---
+# O upload para o Cloudinary corre em segundo plano; CAROMETRO_UPLOADER=local troca-o por
+# uma cópia para static/fotos/uploads (sem rede), útil em desenvolvimento e testes.
+@lru_cache(maxsize=None)
+def _cloudinary_uploader():
+    # Importado e configurado só no primeiro upload, e não no arranque de cada worker
+    import cloudinary
+    import cloudinary.uploader
+    cloudinary.config(
+        cloud_name = os.getenv('CLOUD_NAME'),
+        api_key = os.getenv('API_KEY'),
+        api_secret = os.getenv('API_SECRET')
+    )
+    return cloudinary.uploader
+
+def enviar_para_cloudinary(caminho, public_id):
+    uploader = _cloudinary_uploader()
+    with medir('upload_foto'):
+        upload_result = uploader.upload(caminho, public_id=public_id, overwrite=True, unique_filename=False)
+    return upload_result.get('secure_url')
+
+def foto_enviada(nome_completo, foto_url):
+    armazenamento.salvar_colaborador(nome_completo, {'Foto_URL': foto_url})
+    invalidar_cache_roster()
+
+def criar_fila_uploads():
+    if os.getenv('CAROMETRO_UPLOADER', 'cloudinary').lower() == 'local':
+        enviar = EnvioLocal(os.path.join(app.static_folder, 'fotos', 'uploads'), '/static/fotos/uploads')
+    else:
+        enviar = enviar_para_cloudinary
+    return FilaUploads(PASTA_UPLOADS_PENDENTES, enviar, foto_enviada)
+
+fila_uploads = criar_fila_uploads()
+
+# --- AVATARES E MINIATURAS ---
+# Quem não tem Foto_URL recebe um avatar SVG com as iniciais, gerado aqui (sem depender de um
+# serviço externo). Com CAROMETRO_MINIATURAS=1 e o Pillow instalado, as fotos passam por
+# /miniatura/<id>, que guarda em disco uma versão reduzida da foto original.
+@lru_cache(maxsize=None)
+def _pillow():
+    # Importado só na primeira miniatura, e não no arranque de cada worker
+    from PIL import Image, ImageOps
+    return Image, ImageOps
+
+PASTA_MINIATURAS = 'cache_miniaturas'
+TAMANHO_MINIATURA = 300
+TAMANHO_AVATAR = 150
+ESPERA_APOS_FALHA_MINIATURA = 600
+# Foto_URL -> instante da última falha, da mais antiga para a mais recente; limitado como os outros caches
+MAX_FALHAS_MINIATURAS = 1024
+_lock_falhas_miniaturas = threading.Lock()
+_falhas_miniaturas = OrderedDict()
+
+def miniatura_falhou_recentemente(foto_url):
+    with _lock_falhas_miniaturas:
+        return time.time() - _falhas_miniaturas.get(foto_url, 0) < ESPERA_APOS_FALHA_MINIATURA
+
+def registar_falha_miniatura(foto_url):
+    with _lock_falhas_miniaturas:
+        _falhas_miniaturas.pop(foto_url, None)
+        _falhas_miniaturas[foto_url] = agora = time.time()
+        while _falhas_miniaturas:
+            url_antiga, instante = next(iter(_falhas_miniaturas.items()))
+            if len(_falhas_miniaturas) <= MAX_FALHAS_MINIATURAS and agora - instante < ESPERA_APOS_FALHA_MINIATURA: break
+            del _falhas_miniaturas[url_antiga]
+MINIATURAS_ATIVAS = os.getenv('CAROMETRO_MINIATURAS', '0') == '1'
+if MINIATURAS_ATIVAS and importlib.util.find_spec('PIL') is None:
+    print("AVISO: CAROMETRO_MINIATURAS=1 mas o Pillow não está instalado; as fotos serão servidas no tamanho original.")
+    MINIATURAS_ATIVAS = False
+
+def url_foto(colaborador):
+    foto_url = colaborador.get('Foto_URL')
+    if not (isinstance(foto_url, str) and foto_url.strip()):
+        return f"/avatar/{quote(colaborador['Nome_completo'], safe='')}.svg"
+    if MINIATURAS_ATIVAS:
+        # A versão muda com a Foto_URL, por isso a miniatura pode ficar em cache no navegador
+        return f"/miniatura/{colaborador['id']}?v={hashlib.sha256(foto_url.encode('utf-8')).hexdigest()[:10]}"
+    return foto_url
+
+@lru_cache(maxsize=4096)
+def gerar_avatar_svg(nome_completo):
+    partes = nome_completo.split()
+    iniciais = (partes[0][0] + (partes[-1][0] if len(partes) > 1 else '')).upper() if partes else '?'
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{TAMANHO_AVATAR}" height="{TAMANHO_AVATAR}" viewBox="0 0 {TAMANHO_AVATAR} {TAMANHO_AVATAR}">'
+        f'<rect width="100%" height="100%" fill="#cccccc"/>'
+        f'<text x="50%" y="50%" dy=".35em" text-anchor="middle" font-family="Helvetica, Arial, sans-serif" font-size="{TAMANHO_AVATAR * 2 // 5}" fill="#000000">{escape(iniciais)}</text>'
+        f'</svg>'
+    ).encode('utf-8')
+    return svg, hashlib.sha256(svg).hexdigest()[:16]
+
+def obter_miniatura(foto_url):
+    """Devolve o caminho da miniatura em disco, criando-a na primeira vez (a partir de /static ou de um URL remoto)."""
+    caminho = os.path.join(PASTA_MINIATURAS, hashlib.sha256(foto_url.encode('utf-8')).hexdigest()[:32] + '.jpg')
+    if os.path.exists(caminho): return caminho
+    os.makedirs(PASTA_MINIATURAS, exist_ok=True)
+    with bloqueio_arquivo(caminho):
+        if os.path.exists(caminho): return caminho
+        with medir('miniatura'):
+            if foto_url.startswith('/static/'):
+                with open(safe_join(app.static_folder, foto_url[len('/static/'):]), 'rb') as f: original = f.read()
+            else:
+                from urllib.request import urlopen  # só as miniaturas de fotos remotas precisam dele
+                with urlopen(foto_url, timeout=15) as resposta: original = resposta.read()
+            Image, ImageOps = _pillow()
+            imagem = ImageOps.exif_transpose(Image.open(io.BytesIO(original)))
+            imagem.thumbnail((TAMANHO_MINIATURA, TAMANHO_MINIATURA))
+            escrever_atomico(caminho, lambda f: imagem.convert('RGB').save(f, 'JPEG', quality=85, optimize=True))
+    return caminho
+
 # --- FUNÇÕES AUXILIARES ---
-def carregar_dados_json(arquivo):
-    try:
-        with open(arquivo, 'r', encoding='utf-8') as f: return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError): return {}
+# --- MOTOR DE PONTUAÇÃO ---
+# Guarda ESTRUTURA_ATRIBUTOS e PESOS como matrizes para que as médias dos atributos
+# principais, o overall no setor atual e o overall simulado em todos os setores saiam
+# de duas multiplicações de matrizes para o roster inteiro. As divisões e o round()
+# (meio para o par) são os mesmos do cálculo em Python, logo os resultados são idênticos.
+class MotorPontuacao:
+    def __init__(self, estrutura, pesos, nota_padrao=50):
+        self.nota_padrao = nota_padrao
+        self.atributos = list(estrutura.keys())
+        self.sub_atributos = [sub for subs in estrutura.values() for sub in subs]
+        self.setores = list(pesos.keys())
+        self._indice_setor = {setor.upper(): i for i, setor in enumerate(self.setores)}
+        self._indice_default = self._indice_setor.get('DEFAULT')
+
+        # Sub-atributos -> atributos principais (soma) e nº de sub-atributos por principal
+        self.agregacao = np.zeros((len(self.sub_atributos), len(self.atributos)))
+        coluna = 0
+        for j, subs in enumerate(estrutura.values()):
+            self.agregacao[coluna:coluna + len(subs), j] = 1
+            coluna += len(subs)
+        self.contagem = np.array([len(subs) for subs in estrutura.values()], dtype=float)
+        self._sem_subs = self.contagem == 0
+
+        # Atributos principais -> setores (pesos); pesos de atributos inexistentes contam com a nota padrão
+        self.pesos = np.zeros((len(self.atributos), len(self.setores)))
+        self.constante = np.zeros(len(self.setores))
+        for s, pesos_setor in enumerate(pesos.values()):
+            for attr, peso in pesos_setor.items():
+                if attr in estrutura: self.pesos[self.atributos.index(attr), s] = peso
+                else: self.constante[s] += nota_padrao * peso
+        self.soma_pesos = np.array([sum(p.values()) for p in pesos.values()], dtype=float)
+        # Para uma só pessoa o numpy custa mais do que poupa: o caminho escalar usa as mesmas
+        # contas em Python puro, pela mesma ordem, e dá exatamente o mesmo resultado
+        self._estrutura = list(estrutura.items())
+        self._pesos_setores = [(list(p.items()), sum(p.values())) for p in pesos.values()]
+
+    def indice_setor(self, processo):
+        setor = processo.upper() if isinstance(processo, str) and processo.strip() else 'DEFAULT'
+        return self._indice_setor.get(setor, self._indice_default)
+
+    def tem_setor(self, setor):
+        return setor.upper() in self._indice_setor
+
+    def matriz_notas(self, lista_notas):
+        """Converte uma lista de dicts {sub_atributo: nota} numa matriz N x sub-atributos."""
+        matriz = np.full((len(lista_notas), len(self.sub_atributos)), self.nota_padrao, dtype=float)
+        indice = {sub: i for i, sub in enumerate(self.sub_atributos)}
+        for linha, notas in enumerate(lista_notas):
+            for sub, nota in notas.items():
+                i = indice.get(sub)
+                if i is not None: matriz[linha, i] = nota
+        return matriz
+
+    def medias_principais(self, notas):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            medias = np.round((notas @ self.agregacao) / self.contagem)
+        medias[:, self._sem_subs] = self.nota_padrao
+        return medias.astype(int)
+
+    def overalls_por_setor(self, medias):
+        """Overall simulado de cada pessoa (linhas) em cada setor de PESOS (colunas)."""
+        numerador = medias @ self.pesos + self.constante
+        with np.errstate(divide='ignore', invalid='ignore'):
+            overalls = np.round(numerador / self.soma_pesos)
+        overalls[:, self.soma_pesos <= 0] = self.nota_padrao
+        return overalls.astype(int)
 
-def salvar_dados_json(data, arquivo):
-    with open(arquivo, 'w', encoding='utf-8') as f: json.dump(data, f, indent=4, ensure_ascii=False)
+    def overall(self, medias, processo):
+        return int(self.overalls_por_setor(np.atleast_2d(medias))[0, self.indice_setor(processo)])
+
+    def medias_escalares(self, notas):
+        """Versão escalar de medias_principais para uma pessoa: {atributo: média}."""
+        return {attr: round(sum(notas.get(sub, self.nota_padrao) for sub in subs) / len(subs)) if subs else self.nota_padrao for attr, subs in self._estrutura}
+
+    def overall_escalar(self, medias, processo):
+        """Versão escalar de overall() a partir de {atributo: média}."""
+        pesos_setor, soma_pesos = self._pesos_setores[self.indice_setor(processo)]
+        if soma_pesos <= 0: return self.nota_padrao
+        return round(sum(medias.get(attr, self.nota_padrao) * peso for attr, peso in pesos_setor) / soma_pesos)
+
+motor_pontuacao = MotorPontuacao(ESTRUTURA_ATRIBUTOS, PESOS)
+
+@lru_cache(maxsize=32)
+def _motor_por_pesos(pesos_congelados):
+    return MotorPontuacao(ESTRUTURA_ATRIBUTOS, {setor: dict(pesos) for setor, pesos in pesos_congelados})
 
 def calcular_overall_com_notas(notas_sub_atributos, processo_colaborador):
-    medias_principais = {}
-    for attr_principal, sub_attrs in ESTRUTURA_ATRIBUTOS.items():
-        soma_sub = sum(notas_sub_atributos.get(sub, 50) for sub in sub_attrs)
-        media = round(soma_sub / len(sub_attrs)) if sub_attrs else 50
-        medias_principais[attr_principal] = media
-    setor = str(processo_colaborador).upper() if isinstance(processo_colaborador, str) and processo_colaborador.strip() else 'DEFAULT'
-    pesos_upper = {k.upper(): v for k, v in PESOS.items()}
-    pesos_setor = pesos_upper.get(setor, pesos_upper.get('DEFAULT'))
-    numerador = sum(medias_principais.get(k, 50) * v for k, v in pesos_setor.items())
-    denominador = sum(pesos_setor.values())
-    return round(numerador / denominador) if denominador > 0 else 50
+    return motor_pontuacao.overall_escalar(motor_pontuacao.medias_escalares(notas_sub_atributos), processo_colaborador)
 
 def calcular_overall_individual(colaborador, pesos_gerais):
+    if pesos_gerais is PESOS:
+        motor = motor_pontuacao
+    else:
+        motor = _motor_por_pesos(tuple((setor, tuple(pesos.items())) for setor, pesos in pesos_gerais.items()))
     medias_principais = {item['nome_principal']: item['valor_principal'] for item in colaborador['atributos_detalhados']}
-    processo_colaborador = colaborador.get('Processo')
-    setor_atual = str(processo_colaborador).upper() if isinstance(processo_colaborador, str) and processo_colaborador.strip() else 'DEFAULT'
-    pesos_upper = {k.upper(): v for k, v in pesos_gerais.items()}
-    pesos_setor = pesos_upper.get(setor_atual, pesos_upper.get('DEFAULT'))
-    numerador = sum(medias_principais.get(k, 50) * v for k, v in pesos_setor.items())
-    denominador = sum(pesos_setor.values())
-    return round(numerador / denominador) if denominador > 0 else 50
+    return motor.overall_escalar(medias_principais, colaborador.get('Processo'))
 
 def get_cor_por_pontuacao(pontuacao):
     if pontuacao >= 80: return '#28a745'
@@ -120,51 +330,927 @@ def converter_score_para_estrelas(score):
     if score > 0: return 1
     return 0
 
-# --- FUNÇÃO PRINCIPAL DE PROCESSAMENTO DE DADOS ---
+# --- ATRIBUTOS DETALHADOS (VISTAS SOBRE ARRAYS) ---
+# As notas de todo o roster ficam num único array (pessoas x sub-atributos) e as médias noutro
+# (pessoas x atributos). c['atributos_detalhados'] é uma vista com __slots__ sobre a linha da
+# pessoa: expõe os mesmos campos da antiga lista de dicts (attr.cor nos templates ou
+# attr['valor_principal'] no código), mas nomes, cores e ícones vêm das estruturas globais em
+# vez de serem copiados para cada registo. para_lista() devolve a forma em dicts, para JSON.
+_NOMES_ATRIBUTOS = tuple(ESTRUTURA_ATRIBUTOS)
+# Intervalo de colunas de motor_pontuacao.sub_atributos que pertence a cada atributo
+_FIM_ATRIBUTOS = list(accumulate(len(subs) for subs in ESTRUTURA_ATRIBUTOS.values()))
+_COLUNAS_ATRIBUTOS = list(zip([0] + _FIM_ATRIBUTOS[:-1], _FIM_ATRIBUTOS))
+
+class TabelaAtributos:
+    __slots__ = ('notas', 'medias')
+
+    def __init__(self, notas, medias):
+        # int16 chega para as notas (0-100); notas não inteiras, se as houver, ficam como estão
+        inteiras = np.isfinite(notas).all() and np.array_equal(notas, np.round(notas)) and (np.abs(notas) < 2 ** 15).all()
+        self.notas = notas.astype(np.int16) if inteiras else notas
+        self.medias = medias.astype(np.int16)
+
+class _Vista:
+    __slots__ = ()
+    campos = ()
+
+    def __getitem__(self, chave):
+        if chave not in self.campos: raise KeyError(chave)
+        return getattr(self, chave)
+
+    def get(self, chave, padrao=None):
+        return getattr(self, chave) if chave in self.campos else padrao
+
+    def keys(self):
+        return self.campos
+
+    def para_dict(self):
+        return {campo: getattr(self, campo) for campo in self.campos}
+
+class SubAtributo(_Vista):
+    __slots__ = ('_tabela', '_linha', '_coluna')
+    campos = ('nome', 'valor')
+
+    def __init__(self, tabela, linha, coluna):
+        self._tabela, self._linha, self._coluna = tabela, linha, coluna
+
+    @property
+    def nome(self): return motor_pontuacao.sub_atributos[self._coluna]
+
+    @property
+    def valor(self): return self._tabela.notas[self._linha, self._coluna].item()
+
+class AtributoDetalhado(_Vista):
+    __slots__ = ('_tabela', '_linha', '_j')
+    campos = ('nome_principal', 'valor_principal', 'cor', 'icone', 'sub_atributos')
+
+    def __init__(self, tabela, linha, j):
+        self._tabela, self._linha, self._j = tabela, linha, j
+
+    @property
+    def nome_principal(self): return _NOMES_ATRIBUTOS[self._j]
+
+    @property
+    def valor_principal(self): return self._tabela.medias[self._linha, self._j].item()
+
+    @property
+    def cor(self): return get_cor_por_pontuacao(self.valor_principal)
+
+    @property
+    def icone(self): return ICON_MAP.get(self.nome_principal, '')
+
+    @property
+    def sub_atributos(self):
+        return [SubAtributo(self._tabela, self._linha, coluna) for coluna in range(*_COLUNAS_ATRIBUTOS[self._j])]
+
+    def para_dict(self):
+        dados = super().para_dict()
+        dados['sub_atributos'] = [sub.para_dict() for sub in dados['sub_atributos']]
+        return dados
+
+class AtributosDetalhados(Sequence):
+    __slots__ = ('_tabela', '_linha')
+
+    def __init__(self, tabela, linha):
+        self._tabela, self._linha = tabela, linha
+
+    def __len__(self):
+        return len(_NOMES_ATRIBUTOS)
+
+    def __getitem__(self, j):
+        if isinstance(j, slice): return [self[k] for k in range(*j.indices(len(self)))]
+        if not -len(self) <= j < len(self): raise IndexError(j)
+        return AtributoDetalhado(self._tabela, self._linha, j % len(self))
+
+    def para_lista(self):
+        return [atributo.para_dict() for atributo in self]
+
+# --- CACHE DO ROSTER ---
+# O roster enriquecido é montado uma única vez e reaproveitado entre requisições.
+# Ele só é reconstruído quando a assinatura do armazenamento muda (mtime/tamanho dos
+# ficheiros ou versão da base SQLite) ou quando uma rota de escrita chama invalidar_cache_roster().
+# Com CAROMETRO_SNAPSHOT_PARTILHADO=1 o roster montado por um worker é publicado em disco
+# (ver snapshot_partilhado.py) e os outros workers carregam-no em vez de o montarem de novo.
+PASTA_SNAPSHOT = 'cache_roster'
+snapshot_partilhado = SnapshotPartilhado(PASTA_SNAPSHOT) if os.getenv('CAROMETRO_SNAPSHOT_PARTILHADO', '0') == '1' else None
+
+_lock_cache_roster = threading.Lock()
+# versao_minima: publicações abaixo desta versão podem ser anteriores a uma escrita feita aqui
+_cache_roster = {'assinatura': None, 'geracao': 0, 'snapshot': None, 'versao_minima': 0}
+_estatisticas_cache_roster = {'hits': 0, 'misses': 0, 'rebuilds': 0, 'invalidacoes': 0, 'carregados_partilhados': 0, 'tempo_rebuild_total': 0.0, 'tempo_ultimo_rebuild': 0.0}
+
+def invalidar_cache_roster():
+    publicado = snapshot_partilhado.versao_publicada() if snapshot_partilhado else None
+    with _lock_cache_roster:
+        _cache_roster['assinatura'] = None
+        _cache_roster['snapshot'] = None
+        _cache_roster['geracao'] += 1
+        if publicado: _cache_roster['versao_minima'] = max(_cache_roster['versao_minima'], publicado[0] + 1)
+        _estatisticas_cache_roster['invalidacoes'] += 1
+
+def estatisticas_cache_roster():
+    with _lock_cache_roster:
+        stats = dict(_estatisticas_cache_roster)
+        stats['em_cache'] = _cache_roster['snapshot'] is not None
+        stats['tamanho'] = len(_cache_roster['snapshot'].colaboradores) if _cache_roster['snapshot'] else 0
+        stats['versao_partilhada'] = _cache_roster['snapshot'].versao_partilhada if _cache_roster['snapshot'] else None
+    return stats
+
+class SnapshotRoster:
+    """Roster enriquecido e imutável, com índices para consultas em O(1)."""
+    def __init__(self, colaboradores, overalls_setores=None):
+        self.assinatura = None
+        self.versao_partilhada = None  # versão publicada em PASTA_SNAPSHOT de onde veio (ou que foi publicada)
+        self.colaboradores = colaboradores
+        self.indice_busca = None  # montado na primeira pesquisa (ver get_indice_busca)
+        self.matrizes_talentos = None  # montadas no primeiro pedido (ver get_matrizes_talentos)
+        self.indice_pdi = None  # montado na primeira consulta (ver get_indice_pdi)
+        # Linha i = colaboradores[i]; colunas = motor_pontuacao.setores
+        self.overalls_setores = overalls_setores if overalls_setores is not None else np.zeros((0, len(motor_pontuacao.setores)), dtype=int)
+        self.linha_por_id = {c['id']: i for i, c in enumerate(colaboradores)}
+        self.por_id = {c['id']: c for c in colaboradores}
+        self.por_nome = {c['Nome_completo']: c for c in colaboradores}
+        self.por_equipe = {}
+        for c in colaboradores:
+            self.por_equipe.setdefault((c.get('Processo'), c.get('Turno_Num')), []).append(c)
+
+def _carregar_publicado(publicado, assinatura, versao_minima):
+    """Snapshot publicado por outro processo, se foi montado com estes dados; senão None."""
+    if publicado is None or publicado[1] != repr(assinatura) or publicado[0] < versao_minima: return None
+    dados = snapshot_partilhado.carregar(publicado[0])
+    if dados is None: return None
+    snapshot = SnapshotRoster(*dados)
+    snapshot.versao_partilhada = publicado[0]
+    with _lock_cache_roster: _estatisticas_cache_roster['carregados_partilhados'] += 1
+    return snapshot
+
+def _montar_snapshot(assinatura, versao_minima):
+    if snapshot_partilhado is None: return SnapshotRoster(*_montar_dados_completos())
+    snapshot = _carregar_publicado(snapshot_partilhado.versao_publicada(), assinatura, versao_minima)
+    if snapshot is not None: return snapshot
+    with snapshot_partilhado.bloqueio():
+        # Outro worker pode ter publicado enquanto se esperava pelo bloqueio
+        snapshot = _carregar_publicado(snapshot_partilhado.versao_publicada(), assinatura, versao_minima)
+        if snapshot is not None: return snapshot
+        colaboradores, overalls_setores = _montar_dados_completos()
+        snapshot = SnapshotRoster(colaboradores, overalls_setores)
+        if overalls_setores is not None:
+            snapshot.versao_partilhada = snapshot_partilhado.publicar(repr(assinatura), colaboradores, overalls_setores)
+        return snapshot
+
+def get_roster():
+    """Devolve o snapshot partilhado; os registos não devem ser alterados pelas rotas."""
+    assinatura = armazenamento.assinatura()
+    publicado = snapshot_partilhado.versao_publicada() if snapshot_partilhado else None
+    with _lock_cache_roster:
+        snapshot = _cache_roster['snapshot']
+        # Uma publicação mais recente com a mesma assinatura vem de uma escrita noutro worker
+        mais_recente = publicado is not None and snapshot is not None and publicado[0] > (snapshot.versao_partilhada or 0) and publicado[1] == repr(assinatura)
+        if snapshot is not None and _cache_roster['assinatura'] == assinatura and not mais_recente:
+            _estatisticas_cache_roster['hits'] += 1
+            return snapshot
+        _estatisticas_cache_roster['misses'] += 1
+        geracao = _cache_roster['geracao']
+        versao_minima = _cache_roster['versao_minima']
+
+    inicio = time.perf_counter()
+    snapshot = _montar_snapshot(assinatura, versao_minima)
+    duracao = time.perf_counter() - inicio
+    if metricas.ATIVO: metricas.registar_etapa('montar_roster', duracao)
+    snapshot.assinatura = assinatura
+
+    with _lock_cache_roster:
+        _estatisticas_cache_roster['rebuilds'] += 1
+        _estatisticas_cache_roster['tempo_rebuild_total'] += duracao
+        _estatisticas_cache_roster['tempo_ultimo_rebuild'] = duracao
+        # A troca é uma única atribuição: os pedidos em curso continuam com o snapshot anterior
+        if _cache_roster['geracao'] == geracao:
+            _cache_roster['assinatura'] = assinatura
+            _cache_roster['snapshot'] = snapshot
+    return snapshot
+
+# As funções abaixo devolvem cópias rasas dos registos para que as rotas possam
+# anotar campos (ex.: 'overall') sem alterar o snapshot partilhado.
 def get_dados_completos():
+    return [dict(c) for c in get_roster().colaboradores]
+
+def buscar_colaborador_por_id(colaborador_id):
+    c = get_roster().por_id.get(colaborador_id)
+    return dict(c) if c else None
+
+def buscar_colaborador_por_nome(nome_completo):
+    c = get_roster().por_nome.get(nome_completo)
+    return dict(c) if c else None
+
+def get_equipe(nome_setor, num_turno):
+    return [dict(c) for c in get_roster().por_equipe.get((nome_setor, num_turno), [])]
+
+def roster_em_cache():
+    """Snapshot já montado, se ainda corresponde aos dados; senão None. Nunca monta um novo:
+    as rotas de escrita só precisam do setor e turno atuais e não devem pagar uma reconstrução."""
+    assinatura = armazenamento.assinatura()
+    with _lock_cache_roster:
+        snapshot = _cache_roster['snapshot']
+        return snapshot if snapshot is not None and _cache_roster['assinatura'] == assinatura else None
+
+# --- BUSCA DE COLABORADORES ---
+# Índice de palavras (sem acentos e em minúsculas) do nome, setor, turno e líder, ordenado
+# para que um prefixo seja um intervalo encontrado por bisect. Cada palavra aponta para as
+# linhas do roster que a contêm, com o peso do campo; pertence ao snapshot, por isso é
+# descartado junto com ele quando os dados mudam.
+CAMPOS_BUSCA = (('Nome_completo', 3), ('Processo', 1), ('Turno', 1), ('Lider', 1))
+
+def normalizar_busca(texto):
+    # Números e letras separados: "2º Turno" dá "2", "o", "turno"
+    return re.findall(r'[a-z]+|[0-9]+', unidecode(str(texto)).lower())
+
+class IndiceBusca:
+    def __init__(self, colaboradores):
+        linhas_por_palavra = {}
+        for linha, c in enumerate(colaboradores):
+            for campo, peso in CAMPOS_BUSCA:
+                valor = c.get(campo)
+                if not isinstance(valor, str): continue
+                for palavra in normalizar_busca(valor):
+                    pesos = linhas_por_palavra.setdefault(palavra, {})
+                    if pesos.get(linha, 0) < peso: pesos[linha] = peso
+        self.palavras = sorted(linhas_por_palavra)
+        self.linhas = [linhas_por_palavra[palavra] for palavra in self.palavras]
+        self.nomes = [' '.join(normalizar_busca(c['Nome_completo'])) for c in colaboradores]
+        self.ordem_alfabetica = sorted(range(len(colaboradores)), key=lambda linha: self.nomes[linha])
+
+    def buscar(self, consulta):
+        """Linhas do roster que têm todas as palavras da consulta (como palavra ou prefixo),
+        das mais relevantes para as menos; sem consulta devolve todas por ordem alfabética."""
+        termos = list(dict.fromkeys(normalizar_busca(consulta)))
+        if not termos: return self.ordem_alfabetica
+        pontuacoes = None
+        for termo in termos:
+            melhores = {}
+            # As palavras só têm [a-z0-9], logo todas as que começam pelo termo ficam antes de termo + '{'
+            for k in range(bisect_left(self.palavras, termo), bisect_left(self.palavras, termo + '{')):
+                exata = self.palavras[k] == termo
+                for linha, peso in self.linhas[k].items():
+                    valor = 2 * peso + exata
+                    if melhores.get(linha, 0) < valor: melhores[linha] = valor
+            pontuacoes = melhores if pontuacoes is None else {linha: p + melhores[linha] for linha, p in pontuacoes.items() if linha in melhores}
+            if not pontuacoes: return []
+        # O nome que começa exatamente pela consulta vem sempre primeiro
+        inicio_nome = ' '.join(termos)
+        return sorted(pontuacoes, key=lambda linha: (not self.nomes[linha].startswith(inicio_nome), -pontuacoes[linha], self.nomes[linha]))
+
+def get_indice_busca(roster):
+    if roster.indice_busca is None:
+        with medir('indice_busca'):
+            roster.indice_busca = IndiceBusca(roster.colaboradores)
+    return roster.indice_busca
+
+# --- ESTATÍSTICAS DOS TIMES (VISÃO MATERIALIZADA) ---
+# Agregados por time (Turno x Processo): nº de membros, soma/média do overall, estrelas e
+# ranking. São reconstruídos a partir do roster só quando os dados mudam por fora; as
+# escritas feitas por esta aplicação (avaliação, mudança de setor) atualizam apenas a
+# pessoa alterada, a partir das médias que a própria visão guarda, sem precisar do roster.
+# Essas escritas passam por escrever_com_times(), para que a assinatura antes, a escrita e a
+# assinatura depois não se misturem com as de outra thread.
+def _chave_time(colaborador):
+    turno, processo = colaborador.get('Turno'), colaborador.get('Processo')
+    return (turno if isinstance(turno, str) else 'N/A', processo if isinstance(processo, str) else 'N/A')
+
+class EstatisticasTimes:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lock_escrita = threading.Lock()
+        self.assinatura = None
+        self._times = {}
+        self._membros = {}
+        # nome -> {'id', 'Processo', 'Turno', 'Turno_Num', 'foto', 'medias'}: o que é preciso para
+        # voltar a pontuar a pessoa quando a avaliação ou o setor mudam
+        self._pessoas = {}
+        self._proxima_ordem = 0
+
+    def reconstruir(self, colaboradores, assinatura):
+        with self._lock:
+            self._times, self._membros, self._pessoas, self._proxima_ordem = {}, {}, {}, 0
+            for c in colaboradores:
+                self._pessoas[c['Nome_completo']] = {
+                    'id': c['id'], 'Processo': c.get('Processo'), 'Turno': c.get('Turno'), 'Turno_Num': c.get('Turno_Num'), 'foto': c['foto'],
+                    'medias': {item['nome_principal']: item['valor_principal'] for item in c['atributos_detalhados']},
+                }
+                self._adicionar(c['id'], c['Nome_completo'], c['foto'], c['overall'], _chave_time(c))
+            self.assinatura = assinatura
+
+    def _adicionar(self, colaborador_id, nome_completo, foto, overall, chave, ordem=None):
+        if ordem is None:
+            ordem, self._proxima_ordem = self._proxima_ordem, self._proxima_ordem + 1
+        time_ = self._times.setdefault(chave, {'membros': {}, 'soma': 0, 'ranking': None})
+        # 'versao' muda com tudo o que a linha do ranking mostra (ver fragmento())
+        time_['membros'][colaborador_id] = {'id': colaborador_id, 'Nome_completo': nome_completo, 'foto': foto, 'overall': overall, 'versao': (foto, overall)}
+        time_['soma'] += overall
+        time_['ranking'] = None
+        self._membros[colaborador_id] = (chave, ordem)
+
+    def _remover(self, colaborador_id):
+        chave, ordem = self._membros.pop(colaborador_id)
+        time_ = self._times[chave]
+        time_['soma'] -= time_['membros'].pop(colaborador_id)['overall']
+        time_['ranking'] = None
+        if not time_['membros']: del self._times[chave]
+        return ordem
+
+    def pessoa(self, nome_completo, assinatura):
+        """Setor, turno e médias atuais da pessoa, se a visão reflete os dados com esta assinatura; senão None."""
+        with self._lock:
+            if self.assinatura is None or self.assinatura != assinatura: return None
+            pessoa = self._pessoas.get(nome_completo)
+            return dict(pessoa) if pessoa else None
+
+    def aplicar(self, alteracoes, assinatura_antes, assinatura_depois):
+        """
+        Aplica as alterações gravadas: [(nome, notas ou None, novo Processo ou None)]. O novo overall
+        sai das médias guardadas aqui. Se a visão não refletia o estado anterior à escrita, ou se a
+        escrita traz para o roster alguém que ela não conhece, é descartada e reconstruída na próxima leitura.
+        """
+        with self._lock:
+            if self.assinatura is None or self.assinatura != assinatura_antes:
+                self.assinatura = None
+                return
+            for nome_completo, notas, novo_processo in alteracoes:
+                pessoa = self._pessoas.get(nome_completo)
+                if pessoa is None:
+                    # Só quem está no roster conta; voltar de "Desligado" obriga a reconstruir
+                    if novo_processo is not None and novo_processo != 'Desligado':
+                        self.assinatura = None
+                        return
+                    continue
+                if notas is not None: pessoa['medias'] = motor_pontuacao.medias_escalares(notas)
+                if novo_processo is not None: pessoa['Processo'] = novo_processo
+                ordem = self._remover(pessoa['id'])
+                if pessoa['Processo'] == 'Desligado':
+                    del self._pessoas[nome_completo]
+                    continue
+                overall = motor_pontuacao.overall_escalar(pessoa['medias'], pessoa['Processo'])
+                self._adicionar(pessoa['id'], nome_completo, pessoa['foto'], overall, _chave_time(pessoa), ordem)
+            self.assinatura = assinatura_depois
+
+    def _ranking(self, time_):
+        if time_['ranking'] is None:
+            membros = time_['membros'].values()
+            time_['ranking'] = sorted(membros, key=lambda m: (-m['overall'], self._membros[m['id']][1]))
+        return time_['ranking']
+
+    def resumo(self):
+        """Devolve (stats_times, dados_agrupados) no formato usado por detalhamento_geral.html."""
+        with self._lock:
+            stats_times, dados_agrupados = {}, {}
+            for (turno, processo), time_ in self._times.items():
+                ranking = self._ranking(time_)
+                media_overall_time = time_['soma'] / len(ranking)
+                stats_times.setdefault(turno, []).append({
+                    'nome_setor': processo, 'membros': len(ranking), 'soma_overall': time_['soma'],
+                    'media_overall': round(media_overall_time), 'estrelas': converter_score_para_estrelas(media_overall_time)
+                })
+                dados_agrupados.setdefault(turno, {})[processo] = list(ranking)
+            for turno in stats_times:
+                stats_times[turno] = sorted(stats_times[turno], key=lambda x: x['media_overall'], reverse=True)
+            return stats_times, dados_agrupados
+
+estatisticas_times = EstatisticasTimes()
+
+def get_estatisticas_times():
+    if estatisticas_times.assinatura is None or estatisticas_times.assinatura != armazenamento.assinatura():
+        roster = get_roster()
+        estatisticas_times.reconstruir(roster.colaboradores, roster.assinatura)
+    return estatisticas_times
+
+def escrever_com_times(escrever, alteracoes=()):
+    """
+    Corre escrever() (a escrita no armazenamento, que invalida o roster) e aplica as alterações
+    à visão dos times (ver EstatisticasTimes.aplicar). Uma escrita que não mexe nos times passa
+    alteracoes vazias, para que a visão continue válida com a nova assinatura.
+    """
+    with estatisticas_times.lock_escrita:
+        assinatura_antes = armazenamento.assinatura()
+        resultado = escrever()
+        estatisticas_times.aplicar(alteracoes, assinatura_antes, armazenamento.assinatura())
+    return resultado
+
+def setor_turno_historico(nome_completo, processo_informado):
+    """
+    (processo, turno) a gravar numa entrada nova do histórico, sem montar o roster: vêm da visão
+    dos times ou do snapshot já montado; quem não está no roster fica com o processo informado.
+    Se nenhum dos dois está em dia ficam em branco e as tendências resolvem-nos na leitura.
+    """
+    assinatura = armazenamento.assinatura()
+    pessoa = estatisticas_times.pessoa(nome_completo, assinatura)
+    if pessoa is not None: return pessoa['Processo'], pessoa['Turno_Num']
+    if estatisticas_times.assinatura == assinatura: return processo_informado, None
+    roster = roster_em_cache()
+    if roster is None: return None, None
+    colaborador = roster.por_nome.get(nome_completo)
+    return (colaborador.get('Processo'), colaborador.get('Turno_Num')) if colaborador else (processo_informado, None)
+
+# --- MATRIZ DE TALENTOS (9-BOX) DE TODOS OS TIMES ---
+# Uma única passagem pelo roster coloca cada pessoa na matriz do seu time (Processo x Turno),
+# com Técnica no eixo vertical e Comportamento no horizontal. O resultado pertence ao snapshot,
+# por isso a matriz de um time e a visão de todos os times saem do mesmo cálculo.
+TITULOS_MATRIZ = [["Enigma", "Forte Desempenho", "Alto Potencial"], ["Questionável", "Mantenedor", "Forte Desempenho"], ["Inadequado", "Questionável", "Risco"]]
+_INDICE_TECNICA = list(ESTRUTURA_ATRIBUTOS).index('Tecnica')
+_INDICE_COMPORTAMENTO = list(ESTRUTURA_ATRIBUTOS).index('Comportamento')
+
+def posicao_matriz(score):
+    if score >= 80: return 2
+    if score >= 60: return 1
+    return 0
+
+class MatrizesTalentos:
+    def __init__(self, colaboradores):
+        # (processo, turno) -> matriz 3x3 com as linhas do roster; a linha 0 da matriz é Técnica alta
+        self.times = {}
+        self.contagens = np.zeros((3, 3), dtype=int)
+        for linha, c in enumerate(colaboradores):
+            atributos = c['atributos_detalhados']
+            i = 2 - posicao_matriz(atributos[_INDICE_TECNICA]['valor_principal'])
+            j = posicao_matriz(atributos[_INDICE_COMPORTAMENTO]['valor_principal'])
+            matriz = self.times.get((c.get('Processo'), c.get('Turno_Num')))
+            if matriz is None: matriz = self.times[(c.get('Processo'), c.get('Turno_Num'))] = [[[], [], []], [[], [], []], [[], [], []]]
+            matriz[i][j].append(linha)
+            self.contagens[i, j] += 1
+
+    def resumo_times(self, colaboradores=None):
+        """Contagens por célula e por time, ordenadas por setor e turno; com os colaboradores
+        do roster inclui também os ids de cada célula."""
+        resumo = []
+        for (processo, turno), matriz in sorted(self.times.items(), key=lambda item: (str(item[0][0]), item[0][1] or 0)):
+            contagens = [[len(celula) for celula in linha] for linha in matriz]
+            time_ = {'processo': processo if isinstance(processo, str) else None, 'turno': turno, 'membros': sum(map(sum, contagens)), 'contagens': contagens}
+            if colaboradores is not None:
+                time_['ids'] = [[[colaboradores[posicao]['id'] for posicao in celula] for celula in linha] for linha in matriz]
+            resumo.append(time_)
+        return resumo
+
+def get_matrizes_talentos(roster):
+    if roster.matrizes_talentos is None:
+        with medir('matrizes_talentos'):
+            roster.matrizes_talentos = MatrizesTalentos(roster.colaboradores)
+    return roster.matrizes_talentos
+
+# --- PDI: AÇÕES DE TODOS OS COLABORADORES POR PRAZO ---
+# As ações de PDI do roster são indexadas por status e pelo setor/turno do dono, cada lista
+# ordenada pelo prazo (AAAA-MM-DD). Um intervalo de prazos é encontrado por bisect e as
+# listas dos status pedidos são intercaladas, por isso uma consulta custa o tamanho do
+# resultado (mais um log n), e não o total de ações. Ações sem prazo válido não entram.
+STATUS_PDI_CONCLUIDO = 'Concluído'
+_DATA_ISO = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def _prazo_valido(prazo):
+    if not isinstance(prazo, str) or not _DATA_ISO.fullmatch(prazo): return False
     try:
-        df = pd.read_excel(ARQUIVO_COLABORADORES)
+        date.fromisoformat(prazo)
+    except ValueError:
+        return False
+    return True
+
+class IndicePDI:
+    def __init__(self, colaboradores):
+        listas = {}  # (processo, turno, status) -> [(prazo, id, colaborador, ação)]; None = todos
+        for c in colaboradores:
+            processo, turno = c.get('Processo'), c.get('Turno_Num')
+            for acao in c['pdi']:
+                prazo = acao.get('prazo')
+                if not _prazo_valido(prazo): continue
+                item = (prazo, str(acao.get('id')), c, acao)
+                status = acao.get('status')
+                for chave in ((processo, turno, status), (processo, None, status), (None, turno, status), (None, None, status)):
+                    listas.setdefault(chave, []).append(item)
+        for lista in listas.values(): lista.sort(key=lambda item: item[:2])
+        self.listas = listas
+        self.prazos = {chave: [item[0] for item in lista] for chave, lista in listas.items()}
+        self.status = sorted({chave[2] for chave in listas}, key=str)
+
+    def consultar(self, de=None, ate=None, processo=None, turno=None, status=None):
+        """Ações com de <= prazo < ate (None = sem limite), ordenadas pelo prazo. Sem "status"
+        devolve as que ainda não estão concluídas."""
+        if status is None: status = [s for s in self.status if s != STATUS_PDI_CONCLUIDO]
+        partes = []
+        for s in status:
+            chave = (processo, turno, s)
+            if chave not in self.listas: continue
+            prazos = self.prazos[chave]
+            inicio = bisect_left(prazos, de) if de else 0
+            fim = bisect_left(prazos, ate) if ate else len(prazos)
+            if inicio < fim: partes.append(self.listas[chave][inicio:fim])
+        return list(heapq.merge(*partes, key=lambda item: item[:2]))
+
+def get_indice_pdi(roster):
+    if roster.indice_pdi is None:
+        with medir('indice_pdi'):
+            roster.indice_pdi = IndicePDI(roster.colaboradores)
+    return roster.indice_pdi
+
+# --- TENDÊNCIAS DO HISTÓRICO (AGREGADOS POR MÊS) ---
+# Agregados por (mês, setor, turno) mantidos lendo só as entradas novas do histórico (o cursor
+# vem do armazenamento). Cada grupo guarda a contagem, as somas e um histograma do overall
+# (0-100), o que dá a média e a mediana exatas sem voltar a percorrer o histórico.
+# Entradas antigas sem 'processo'/'turno' usam o setor e o turno atuais do colaborador.
+class GrupoTendencia:
+    __slots__ = ('avaliacoes', 'soma_overall', 'histograma', 'soma_atributos')
+
+    def __init__(self):
+        self.avaliacoes = 0
+        self.soma_overall = 0
+        self.histograma = np.zeros(101, dtype=np.int64)
+        self.soma_atributos = np.zeros(len(ESTRUTURA_ATRIBUTOS), dtype=np.int64)
+
+    def juntar(self, outro):
+        self.avaliacoes += outro.avaliacoes
+        self.soma_overall += outro.soma_overall
+        self.histograma += outro.histograma
+        self.soma_atributos += outro.soma_atributos
+
+    def mediana(self):
+        acumulado = np.cumsum(self.histograma)
+        baixo = int(np.searchsorted(acumulado, (self.avaliacoes - 1) // 2 + 1))
+        alto = int(np.searchsorted(acumulado, self.avaliacoes // 2 + 1))
+        return (baixo + alto) / 2
+
+    def resumo(self):
+        return {
+            'avaliacoes': self.avaliacoes,
+            'media_overall': round(self.soma_overall / self.avaliacoes, 1),
+            'mediana_overall': self.mediana(),
+            'atributos': {attr: round(float(soma) / self.avaliacoes, 1) for attr, soma in zip(ESTRUTURA_ATRIBUTOS, self.soma_atributos)},
+        }
+
+class TendenciasHistorico:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cursor = None
+        self.grupos = {}  # (mês AAAA-MM, processo, turno) -> GrupoTendencia
+
+    def atualizar(self):
+        with self._lock:
+            registros, cursor, reiniciar = armazenamento.ler_historico_desde(self.cursor)
+            if reiniciar: self.grupos = {}
+            if registros: self._acumular(registros)
+            self.cursor = cursor
+
+    def _acumular(self, registros):
+        registros = [(nome, r) for nome, r in registros if isinstance(r.get('data'), str) and len(r['data']) >= 7]
+        # O roster só é preciso para as entradas antigas (evita reconstruí-lo a cada avaliação nova)
+        por_nome = get_roster().por_nome if any(r.get('processo') is None and r.get('turno') is None for _, r in registros) else {}
+        with medir('tendencias'):
+            medias = motor_pontuacao.medias_principais(motor_pontuacao.matriz_notas([r.get('sub_atributos') or {} for _, r in registros]))
+            for (nome, r), medias_atributos in zip(registros, medias):
+                processo, turno = r.get('processo'), r.get('turno')
+                if processo is None and turno is None:
+                    atual = por_nome.get(nome) or {}
+                    processo, turno = atual.get('Processo'), atual.get('Turno_Num')
+                chave = (r['data'][:7], processo or 'N/A', turno if turno is not None else 'N/A')
+                grupo = self.grupos.get(chave)
+                if grupo is None: grupo = self.grupos[chave] = GrupoTendencia()
+                overall = int(r.get('overall') or 0)
+                grupo.avaliacoes += 1
+                grupo.soma_overall += overall
+                grupo.histograma[min(max(overall, 0), 100)] += 1
+                grupo.soma_atributos += medias_atributos
+
+    def consultar(self, de=None, ate=None, processo=None, turno=None, agrupar=('processo', 'turno')):
+        """Séries mensais entre de e ate (AAAA-MM, inclusive), agregadas pelos campos de "agrupar"."""
+        self.atualizar()
+        series = {}
+        with self._lock:
+            for (mes, processo_grupo, turno_grupo), grupo in self.grupos.items():
+                if (de and mes < de) or (ate and mes > ate): continue
+                if processo is not None and processo_grupo != processo: continue
+                if turno is not None and turno_grupo != turno: continue
+                chave = (mes, processo_grupo if 'processo' in agrupar else None, turno_grupo if 'turno' in agrupar else None)
+                if chave not in series: series[chave] = GrupoTendencia()
+                series[chave].juntar(grupo)
+        resultado = []
+        for (mes, processo_grupo, turno_grupo), grupo in sorted(series.items(), key=lambda item: tuple(str(parte) for parte in item[0])):
+            linha = {'mes': mes}
+            if 'processo' in agrupar: linha['processo'] = processo_grupo
+            if 'turno' in agrupar: linha['turno'] = turno_grupo
+            linha.update(grupo.resumo())
+            resultado.append(linha)
+        return resultado
+
+tendencias_historico = TendenciasHistorico()
+
+# --- FUNÇÃO PRINCIPAL DE PROCESSAMENTO DE DADOS ---
+def _montar_dados_completos():
+    try:
+        df = armazenamento.ler_colaboradores()
     except FileNotFoundError:
-        return []
+        return [], None
         
     if 'Processo' in df.columns: df = df[df['Processo'] != 'Desligado']
-    if 'Cargo' not in df.columns or 'Nome_completo' not in df.columns: return [] 
+    if 'Cargo' not in df.columns or 'Nome_completo' not in df.columns: return [], None
     
     df['Cargo'] = df['Cargo'].fillna('').astype(str).str.strip()
     df['Nome_completo'] = df['Nome_completo'].fillna('').astype(str).str.strip()
     df = df[df['Nome_completo'] != '']
     df_filtrado = df[df['Cargo'].isin(['Operacional', 'Op Empilhadeira'])].copy()
     
-    df_filtrado['id'] = range(1, len(df_filtrado) + 1)
+    # O 'id' usado nas URLs é o ID estável gravado com os dados (ver armazenamento.py).
+    df_filtrado['id'] = df_filtrado[COLUNA_ID].astype(int)
     df_filtrado['Turno_Num'] = pd.to_numeric(df_filtrado['Turno'].astype(str).str.extract(r'(\d+)')[0], errors='coerce')
     
-    avaliacoes_atuais = carregar_dados_json(ARQUIVO_AVALIACOES)
-    insignias_atribuidas = carregar_dados_json(ARQUIVO_INSIGNIAS)
-    pdi_colaboradores = carregar_dados_json(ARQUIVO_PDI)
+    avaliacoes_atuais = armazenamento.carregar('avaliacoes')
+    insignias_atribuidas = armazenamento.carregar('insignias')
+    pdi_colaboradores = armazenamento.carregar('pdi')
     colaboradores = df_filtrado.to_dict('records')
 
-    for c in colaboradores:
-        if 'Foto_URL' in c and isinstance(c['Foto_URL'], str) and c['Foto_URL'].strip():
-            c['foto'] = c['Foto_URL']
-        else:
-            c['foto'] = f"https://ui-avatars.com/api/?name={c['Nome_completo'].replace(' ', '+')}&background=cccccc&color=000000&size=150"
+    # Pontuação de todo o roster de uma vez
+    with medir('pontuacao'):
+        notas = motor_pontuacao.matriz_notas([avaliacoes_atuais.get(c['Nome_completo'], {}) for c in colaboradores])
+        medias = motor_pontuacao.medias_principais(notas)
+        overalls_setores = motor_pontuacao.overalls_por_setor(medias)
+    tabela_atributos = TabelaAtributos(notas, medias)
+
+    for linha, c in enumerate(colaboradores):
+        c['Turno_Num'] = int(c['Turno_Num']) if pd.notna(c['Turno_Num']) else None
+        c['overall'] = int(overalls_setores[linha, motor_pontuacao.indice_setor(c.get('Processo'))])
+        c['foto'] = url_foto(c)
         
         notas_sub_atributos = avaliacoes_atuais.get(c['Nome_completo'], {})
-        c['atributos_detalhados'] = []
-        for attr_principal, sub_attrs in ESTRUTURA_ATRIBUTOS.items():
-            soma_sub = sum(notas_sub_atributos.get(sub, 50) for sub in sub_attrs)
-            media = round(soma_sub / len(sub_attrs)) if sub_attrs else 50
-            c['atributos_detalhados'].append({
-                'nome_principal': attr_principal, 'valor_principal': media, 'cor': get_cor_por_pontuacao(media),
-                'icone': ICON_MAP.get(attr_principal, ''), 'sub_atributos': [{'nome': sub, 'valor': notas_sub_atributos.get(sub, 50)} for sub in sub_attrs]
-            })
+        c['atributos_detalhados'] = AtributosDetalhados(tabela_atributos, linha)
         c['insignias'] = insignias_atribuidas.get(c['Nome_completo'], [])
         c['pdi'] = pdi_colaboradores.get(c['Nome_completo'], [])
+        # Muda quando a avaliação, as insígnias, o PDI, a foto ou o setor/turno da pessoa mudam
+        c['versao'] = hashlib.blake2b(repr((
+            sorted(notas_sub_atributos.items()), c['insignias'], c['pdi'], c['foto'], c.get('Processo'), c.get('Turno'), c.get('Cargo'), c['Nome_completo']
+        )).encode('utf-8'), digest_size=8).hexdigest()
     
-    return colaboradores
+    return colaboradores, overalls_setores
+
+# --- MÉTRICAS ---
+# Cada pedido devolve um cabeçalho Server-Timing com as etapas medidas (xlsx, JSON, pontuação,
+# render...) e a duração total entra num histograma por rota, exposto em /metrics.
+# CAROMETRO_METRICAS=0 desliga a recolha.
+if metricas.ATIVO:
+    @app.before_request
+    def iniciar_medicao():
+        g.inicio_pedido = time.perf_counter()
+        g.token_metricas = metricas.iniciar_pedido()
+
+    @app.after_request
+    def registar_medicao(resposta):
+        if 'inicio_pedido' not in g: return resposta
+        duracao = time.perf_counter() - g.inicio_pedido
+        rota = request.url_rule.rule if request.url_rule else 'sem_rota'
+        metricas.registo.observar_pedido(rota, request.method, resposta.status_code, duracao)
+        resposta.headers['Server-Timing'] = metricas.cabecalho_server_timing(metricas.etapas_do_pedido(), duracao)
+        return resposta
+
+    @app.teardown_request
+    def terminar_medicao(erro=None):
+        token = g.pop('token_metricas', None)
+        if token is not None: metricas.terminar_pedido(token)
+
+    def _inicio_render(sender, template, context, **extra):
+        g.inicio_render = time.perf_counter()
+
+    def _fim_render(sender, template, context, **extra):
+        inicio = g.pop('inicio_render', None)
+        if inicio is not None: metricas.registar_etapa('render', time.perf_counter() - inicio)
+
+    before_render_template.connect(_inicio_render, app)
+    template_rendered.connect(_fim_render, app)
+
+@app.route('/metrics')
+def exportar_metricas():
+    if not metricas.ATIVO:
+        return "Métricas desativadas (CAROMETRO_METRICAS=0).", 404
+    return Response(metricas.registo.exportar_prometheus(), mimetype='text/plain; version=0.0.4')
+
+# --- ALOCAÇÃO DE SETORES ---
+# Distribui as pessoas de um turno pelos setores de PESOS de forma a maximizar a soma dos
+# overalls, respeitando as vagas de cada setor e quem estiver fixado (ver alocacao.py).
+SETORES_ALOCAVEIS = [setor for setor in PESOS if setor != 'DEFAULT']
+
+def equipe_do_turno(num_turno):
+    return [c for c in get_roster().colaboradores if c.get('Turno_Num') == num_turno]
+
+def ocupacao_por_setor(equipe):
+    ocupacao = {setor: 0 for setor in SETORES_ALOCAVEIS}
+    for c in equipe:
+        if c.get('Processo') in ocupacao: ocupacao[c['Processo']] += 1
+    return ocupacao
+
+def calcular_alocacao(num_turno, capacidades=None, fixados=None):
+    """
+    capacidades: {setor: vagas}; os setores em falta ficam com o número atual de pessoas.
+    fixados: {id: setor}, com setor None para manter a pessoa no setor atual.
+    """
+    roster = get_roster()
+    equipe = equipe_do_turno(num_turno)
+    if not equipe: raise ValueError(f"Não há colaboradores no {num_turno}º turno.")
+    vagas = ocupacao_por_setor(equipe)
+    for setor, quantidade in (capacidades or {}).items():
+        if setor not in vagas: raise ValueError(f"Setor desconhecido: {setor}")
+        if int(quantidade) < 0: raise ValueError(f"Capacidade negativa para {setor}.")
+        vagas[setor] = int(quantidade)
+
+    posicao_por_id = {c['id']: i for i, c in enumerate(equipe)}
+    fixados_idx = {}
+    for colaborador_id, setor in (fixados or {}).items():
+        if colaborador_id not in posicao_por_id: raise ValueError(f"O colaborador {colaborador_id} não pertence ao {num_turno}º turno.")
+        setor = setor or equipe[posicao_por_id[colaborador_id]].get('Processo')
+        if setor not in vagas: raise ValueError(f"Setor inválido para fixar o colaborador {colaborador_id}: {setor}")
+        fixados_idx[posicao_por_id[colaborador_id]] = SETORES_ALOCAVEIS.index(setor)
+
+    colunas = [motor_pontuacao.indice_setor(setor) for setor in SETORES_ALOCAVEIS]
+    valores = roster.overalls_setores[[roster.linha_por_id[c['id']] for c in equipe]][:, colunas]
+    inicio = time.perf_counter()
+    with medir('alocacao'):
+        alocacao, total_otimo = alocar(valores, [vagas[setor] for setor in SETORES_ALOCAVEIS], fixados_idx)
+    duracao = time.perf_counter() - inicio
+
+    pessoas, mudancas = [], []
+    for i, (c, s) in enumerate(zip(equipe, alocacao)):
+        pessoa = {
+            'id': c['id'], 'nome': c['Nome_completo'], 'setor_atual': c.get('Processo'), 'overall_atual': c['overall'],
+            'setor_novo': SETORES_ALOCAVEIS[s] if s is not None else None,
+            'overall_novo': int(valores[i, s]) if s is not None else None, 'fixado': i in fixados_idx,
+        }
+        pessoas.append(pessoa)
+        if pessoa['setor_novo'] != pessoa['setor_atual']: mudancas.append(pessoa)
+    total_atual = sum(c['overall'] for c in equipe)
+    return {
+        'turno': num_turno, 'capacidades': vagas, 'ocupacao_atual': ocupacao_por_setor(equipe),
+        'total_atual': total_atual, 'total_otimo': int(total_otimo), 'ganho': int(total_otimo) - total_atual,
+        'sem_vaga': [p for p in pessoas if p['setor_novo'] is None], 'mudancas': mudancas, 'alocacao': pessoas,
+        'tempo_ms': round(duracao * 1000, 2),
+    }
+
+# --- RESPOSTAS CONDICIONAIS (ETag / Last-Modified) ---
+# A versão dos dados vem apenas de um stat aos ficheiros (ou de uma linha da tabela meta no SQLite),
+# por isso um cliente atualizado recebe 304 sem tocar no pandas nem no Jinja.
+def _arquivos_codigo():
+    # O app.py, os módulos do projeto que ele importa (armazenamento, alocacao, metricas...), os templates
+    # e os ficheiros estáticos, cujo ?v=<hash> vai no HTML (um style.css novo também muda a página).
+    # As fotos em static/fotos são dados, não código, e só entram no HTML pela Foto_URL.
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    modulos = {os.path.abspath(m.__file__) for m in list(sys.modules.values()) if getattr(m, '__file__', None) and os.path.dirname(os.path.abspath(m.__file__)) == raiz}
+    pasta_fotos = os.path.join(app.static_folder, 'fotos')
+    outros = []
+    for pasta_base in (os.path.join(app.root_path, app.template_folder), app.static_folder):
+        for pasta, subpastas, nomes in os.walk(pasta_base):
+            if pasta == pasta_fotos or pasta.startswith(pasta_fotos + os.sep): continue
+            outros.extend(os.path.join(pasta, nome) for nome in nomes)
+    return sorted(modulos | {os.path.abspath(__file__)}) + sorted(outros)
+
+def _calcular_versao_codigo():
+    """(hash, instante da última alteração): um deploy que mude qualquer um destes ficheiros
+    também tem de invalidar as páginas em cache dos clientes."""
+    h = hashlib.sha256()
+    instante = 0.0
+    for arquivo in _arquivos_codigo():
+        h.update(os.path.relpath(arquivo, os.path.dirname(os.path.abspath(__file__))).encode('utf-8'))
+        with open(arquivo, 'rb') as f: h.update(f.read())
+        instante = max(instante, os.stat(arquivo).st_mtime)
+    return h.hexdigest()[:16], instante
+
+VERSAO_CODIGO, INSTANTE_CODIGO = _calcular_versao_codigo()
+
+# Instante atribuído a cada versão dos dados vista por este processo. Normalmente é o da última
+# alteração, mas uma versão nova nunca pode parecer mais antiga que as anteriores (ex.: um
+# ficheiro apagado ou reposto faz recuar o mtime máximo), senão um If-Modified-Since daria 304.
+_lock_instantes_versao = threading.Lock()
+_instantes_versao = OrderedDict()
+MAX_INSTANTES_VERSAO = 64
+
+def _instante_versao(chave, modificado_em):
+    with _lock_instantes_versao:
+        instante = _instantes_versao.get(chave)
+        if instante is None:
+            instante = max(modificado_em, INSTANTE_CODIGO)
+            if _instantes_versao and instante <= max(_instantes_versao.values()): instante = time.time()
+            _instantes_versao[chave] = instante
+            while len(_instantes_versao) > MAX_INSTANTES_VERSAO: _instantes_versao.popitem(last=False)
+        return instante
+
+def resposta_condicional(com_historico=False):
+    """Decorador para rotas GET que só dependem dos dados do armazenamento e dos argumentos do URL."""
+    def decorador(view):
+        @wraps(view)
+        def envolvida(*args, **kwargs):
+            chave, modificado_em = armazenamento.versao_dados(com_historico=com_historico)
+            etag = hashlib.sha256(repr((VERSAO_CODIGO, chave, request.full_path)).encode('utf-8')).hexdigest()[:32]
+            instante = _instante_versao(chave, modificado_em)
+            # O Last-Modified só tem resolução de 1 segundo: enquanto o segundo da última alteração
+            # não acabar, outra escrita ainda caberia nele, por isso não é enviado nem aceite
+            ultima_modificacao = datetime.fromtimestamp(int(instante), timezone.utc) if time.time() - instante >= 1 else None
+            if request.if_none_match:
+                atualizado = request.if_none_match.contains(etag)
+            else:
+                atualizado = ultima_modificacao is not None and request.if_modified_since is not None and ultima_modificacao <= request.if_modified_since
+            resposta = app.response_class(status=304) if atualizado else app.make_response(view(*args, **kwargs))
+            if resposta.status_code in (200, 304):
+                resposta.set_etag(etag)
+                if ultima_modificacao is not None: resposta.last_modified = ultima_modificacao
+                # O navegador guarda a página mas volta sempre a perguntar se mudou
+                resposta.cache_control.no_cache = True
+            return resposta
+        return envolvida
+    return decorador
+
+# --- CACHE DE FRAGMENTOS HTML ---
+# O HTML de cada colaborador numa página (item da grelha da equipe, linha do ranking...) é
+# guardado pela versão do colaborador: enquanto ela não mudar, a página só junta fragmentos
+# já renderizados. Por (template, colaborador, argumentos) fica só a versão mais recente, e o
+# total é limitado em bytes (LRU). CAROMETRO_CACHE_FRAGMENTOS_MB=0 desliga a cache.
+class CacheFragmentos:
+    def __init__(self, max_bytes):
+        self._lock = threading.Lock()
+        self._itens = OrderedDict()  # (template, id, argumentos) -> (versao, html, tamanho)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits, self.misses, self.descartados = 0, 0, 0
+
+    def obter(self, chave, versao, renderizar):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[0] == versao:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+        html = Markup(renderizar())
+        tamanho = sys.getsizeof(html)
+        if tamanho > self.max_bytes: return html
+        with self._lock:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None: self.bytes -= anterior[2]
+            self._itens[chave] = (versao, html, tamanho)
+            self.bytes += tamanho
+            while self.bytes > self.max_bytes:
+                _, (_, _, tamanho_descartado) = self._itens.popitem(last=False)
+                self.bytes -= tamanho_descartado
+                self.descartados += 1
+        return html
+
+    def estatisticas(self):
+        with self._lock:
+            pedidos = self.hits + self.misses
+            return {
+                'hits': self.hits, 'misses': self.misses, 'taxa_acerto': round(self.hits / pedidos, 4) if pedidos else None,
+                'entradas': len(self._itens), 'bytes': self.bytes, 'max_bytes': self.max_bytes, 'descartados': self.descartados,
+            }
+
+cache_fragmentos = CacheFragmentos(int(float(os.getenv('CAROMETRO_CACHE_FRAGMENTOS_MB', '16')) * 1024 * 1024))
+
+@app.template_global()
+def fragmento(nome_template, colaborador, **argumentos):
+    """Renderiza um template parcial para um colaborador (disponível como {{ fragmento(...) }} nos templates)."""
+    def renderizar():
+        return app.jinja_env.get_template(nome_template).render(colaborador=colaborador, **argumentos)
+    if not cache_fragmentos.max_bytes or colaborador.get('versao') is None: return Markup(renderizar())
+    chave = (nome_template, colaborador['id'], tuple(sorted(argumentos.items())))
+    return cache_fragmentos.obter(chave, colaborador['versao'], renderizar)
+
+# --- FICHEIROS ESTÁTICOS ---
+# url_for('static', ...) acrescenta ?v=<hash do conteúdo>; com a versão no URL o ficheiro pode
+# ficar em cache no navegador por um ano, porque qualquer alteração gera um URL novo.
+MAX_AGE_ESTATICOS = 365 * 24 * 3600
+_lock_versoes_estaticos = threading.Lock()
+_versoes_estaticos = {}
+
+def versao_estatico(nome_ficheiro):
+    caminho = safe_join(app.static_folder, nome_ficheiro)
+    try:
+        st = os.stat(caminho) if caminho else None
+    except OSError:
+        return None
+    if st is None: return None
+    assinatura = (st.st_mtime_ns, st.st_size)
+    with _lock_versoes_estaticos:
+        guardado = _versoes_estaticos.get(caminho)
+    if guardado and guardado[0] == assinatura: return guardado[1]
+    with open(caminho, 'rb') as f: versao = hashlib.md5(f.read()).hexdigest()[:10]
+    with _lock_versoes_estaticos:
+        _versoes_estaticos[caminho] = (assinatura, versao)
+    return versao
+
+@app.url_defaults
+def versionar_estaticos(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        versao = versao_estatico(values['filename'])
+        if versao: values['v'] = versao
+
+@app.after_request
+def cache_estaticos(resposta):
+    if request.endpoint == 'static' and request.args.get('v') and resposta.status_code in (200, 304):
+        resposta.cache_control.public = True
+        resposta.cache_control.max_age = MAX_AGE_ESTATICOS
+        resposta.cache_control.immutable = True
+        resposta.cache_control.no_cache = None
+    return resposta
 
 # --- ROTAS DA APLICAÇÃO ---
 @app.route('/')
+@resposta_condicional()
 def dashboard_setores():
     colaboradores = get_dados_completos()
     setores_info = {}
@@ -186,21 +1272,22 @@ def selecao_turno(nome_setor):
     return render_template('selecao_turno.html', nome_setor=nome_setor)
 
 @app.route('/setor/<nome_setor>/turno/<int:num_turno>')
+@resposta_condicional()
 def grid_colaboradores(nome_setor, num_turno):
-    colaboradores = get_dados_completos()
-    equipe_filtrada = [c for c in colaboradores if c.get('Processo') == nome_setor and c.get('Turno_Num') == num_turno]
+    equipe_filtrada = get_equipe(nome_setor, num_turno)
     role = request.args.get('role', 'visualizador')
     return render_template('setor_grid.html', equipe=equipe_filtrada, nome_setor=nome_setor, num_turno=num_turno, role=role)
 
 # Em app.py, substitua a função detalhe_colaborador
 
 @app.route('/colaborador/<int:colaborador_id>')
+@resposta_condicional()
 def detalhe_colaborador(colaborador_id):
-    colaboradores = get_dados_completos()
-    colaborador = next((c for c in colaboradores if c['id'] == colaborador_id), None)
-    if not colaborador: return "Colaborador não encontrado", 404
+    roster = get_roster()
+    if colaborador_id not in roster.por_id: return "Colaborador não encontrado", 404
+    colaborador = dict(roster.por_id[colaborador_id])
     
-    overall = calcular_overall_individual(colaborador, PESOS)
+    overall = colaborador['overall']
     if isinstance(colaborador.get('Turno'), str):
         colaborador['Turno_Num'] = int(colaborador['Turno'].split('º')[0])
     else:
@@ -210,18 +1297,14 @@ def detalhe_colaborador(colaborador_id):
     role = request.args.get('role', 'visualizador')
 
     # --- INÍCIO DA NOVA LÓGICA DE SIMULAÇÃO ---
+    # Os overalls simulados de todos os setores já vêm calculados no snapshot do roster
+    overalls_simulados = roster.overalls_setores[roster.linha_por_id[colaborador_id]]
     overalls_preview = []
-    medias_principais = {item['nome_principal']: item['valor_principal'] for item in colaborador['atributos_detalhados']}
-    
-    for setor, pesos_setor in PESOS.items():
+    for i, setor in enumerate(motor_pontuacao.setores):
         if setor != 'DEFAULT' and setor != colaborador.get('Processo'):
-            numerador = sum(medias_principais.get(k, 50) * v for k, v in pesos_setor.items())
-            denominador = sum(pesos_setor.values())
-            overall_simulado = round(numerador / denominador) if denominador > 0 else 50
-            
             overalls_preview.append({
                 'setor': setor,
-                'overall': overall_simulado
+                'overall': int(overalls_simulados[i])
             })
     # Ordena a lista pelo maior overall simulado
     overalls_preview = sorted(overalls_preview, key=lambda x: x['overall'], reverse=True)
@@ -248,27 +1331,15 @@ def adicionar_colaborador():
                 'Processo': request.form.get('processo'), 'Turno': request.form.get('turno'),
                 'Lider': request.form.get('lider')
             }
+            armazenamento.salvar_colaborador(nome_completo, dados_formulario)
+            invalidar_cache_roster()
+
+            # A foto é enviada em segundo plano; a Foto_URL é preenchida quando o upload terminar.
+            # O id da tarefa segue no redirect para o dashboard acompanhar o estado em /api/uploads/<id>.
             foto = request.files.get('foto')
-            foto_url_para_salvar = None
             if foto and foto.filename != '':
                 nome_base = unidecode(nome_completo.lower().replace(' ', '-'))
-                upload_result = cloudinary.uploader.upload(
-                    foto, public_id=nome_base, overwrite=True, unique_filename=False
-                )
-                foto_url_para_salvar = upload_result.get('secure_url')
-            
-            df = pd.read_excel(ARQUIVO_COLABORADORES)
-            if foto_url_para_salvar:
-                dados_formulario['Foto_URL'] = foto_url_para_salvar
-
-            if nome_completo in df['Nome_completo'].values:
-                for key, value in dados_formulario.items():
-                    df.loc[df['Nome_completo'] == nome_completo, key] = value
-            else:
-                novo_df = pd.DataFrame([dados_formulario])
-                df = pd.concat([df, novo_df], ignore_index=True)
-            
-            df.to_excel(ARQUIVO_COLABORADORES, index=False)
+                return redirect(url_for('dashboard_setores', upload=fila_uploads.enfileirar(foto, nome_completo, nome_base)))
             return redirect(url_for('dashboard_setores'))
         except Exception as e:
             print(f"ERRO AO ADICIONAR/ATUALIZAR COLABORADOR: {e}")
@@ -282,10 +1353,11 @@ def mudar_setor(nome_completo):
     # A lógica POST continua igual, mas usamos um bloco try/except para segurança
     if request.method == 'POST':
         try:
-            df_completo = pd.read_excel(ARQUIVO_COLABORADORES)
             novo_setor = request.form.get('novo_setor')
-            df_completo.loc[df_completo['Nome_completo'] == nome_completo, 'Processo'] = novo_setor
-            df_completo.to_excel(ARQUIVO_COLABORADORES, index=False)
+            def escrever():
+                armazenamento.salvar_colaborador(nome_completo, {'Processo': novo_setor})
+                invalidar_cache_roster()
+            escrever_com_times(escrever, [(nome_completo, None, novo_setor)])
             return redirect(url_for('dashboard_setores'))
         except Exception as e:
             print(f"ERRO AO ATUALIZAR A PLANILHA: {e}")
@@ -293,8 +1365,7 @@ def mudar_setor(nome_completo):
 
     # Lógica GET refatorada para usar get_dados_completos()
     try:
-        todos_colaboradores = get_dados_completos()
-        colaborador = next((c for c in todos_colaboradores if c['Nome_completo'] == nome_completo), None)
+        colaborador = buscar_colaborador_por_nome(nome_completo)
 
         if not colaborador:
             return "Colaborador não encontrado", 404
@@ -309,54 +1380,69 @@ def mudar_setor(nome_completo):
          return "Ocorreu um erro ao carregar a página.", 500
     
 @app.route('/detalhamento')
+@resposta_condicional()
 def detalhamento_geral():
-    colaboradores = get_dados_completos()
-    for c in colaboradores:
-        c['overall'] = calcular_overall_individual(c, PESOS)
-    dados_agrupados = {}
-    for c in colaboradores:
-        turno = c.get('Turno', 'N/A')
-        processo = c.get('Processo', 'N/A')
-        if turno not in dados_agrupados: dados_agrupados[turno] = {}
-        if processo not in dados_agrupados[turno]: dados_agrupados[turno][processo] = []
-        dados_agrupados[turno][processo].append(c)
-    stats_times = {}
-    for turno, processos in dados_agrupados.items():
-        if turno not in stats_times: stats_times[turno] = []
-        for processo, membros in processos.items():
-            membros_ordenados = sorted(membros, key=lambda x: x['overall'], reverse=True)
-            dados_agrupados[turno][processo] = membros_ordenados
-            media_overall_time = sum(m['overall'] for m in membros) / len(membros) if membros else 0
-            estrelas_time = converter_score_para_estrelas(media_overall_time)
-            stats_times[turno].append({'nome_setor': processo, 'media_overall': round(media_overall_time), 'estrelas': estrelas_time})
-        stats_times[turno] = sorted(stats_times[turno], key=lambda x: x['media_overall'], reverse=True)
+    stats_times, dados_agrupados = get_estatisticas_times().resumo()
     return render_template('detalhamento_geral.html', dados_agrupados=dados_agrupados, stats_times=stats_times)
 
 @app.route('/matriz_talentos/<nome_setor>/<int:num_turno>')
+@resposta_condicional()
 def matriz_talentos(nome_setor, num_turno):
-    colaboradores = get_dados_completos()
-    equipe_filtrada = [c for c in colaboradores if c.get('Processo') == nome_setor and c.get('Turno_Num') == num_turno]
-    matriz = [[[], [], []], [[], [], []], [[], [], []]]
-    titulos_matriz = [["Enigma", "Forte Desempenho", "Alto Potencial"], ["Questionável", "Mantenedor", "Forte Desempenho"], ["Inadequado", "Questionável", "Risco"]]
-    def get_posicao(score):
-        if score >= 80: return 2
-        if score >= 60: return 1
-        return 0
-    for c in equipe_filtrada:
-        atributos = {item['nome_principal']: item['valor_principal'] for item in c['atributos_detalhados']}
-        score_tecnica = atributos.get('Tecnica', 0)
-        score_comportamento = atributos.get('Comportamento', 0)
-        pos_x, pos_y = get_posicao(score_comportamento), get_posicao(score_tecnica)
-        matriz[2 - pos_y][pos_x].append(c)
-    return render_template('matriz_talentos.html', matriz=matriz, titulos=titulos_matriz, nome_setor=nome_setor, num_turno=num_turno)
+    roster = get_roster()
+    linhas = get_matrizes_talentos(roster).times.get((nome_setor, num_turno), [[[], [], []], [[], [], []], [[], [], []]])
+    matriz = [[[roster.colaboradores[linha] for linha in celula] for celula in linha_matriz] for linha_matriz in linhas]
+    return render_template('matriz_talentos.html', matriz=matriz, titulos=TITULOS_MATRIZ, nome_setor=nome_setor, num_turno=num_turno)
+
+@app.route('/matriz_talentos')
+@resposta_condicional()
+def matriz_talentos_geral():
+    matrizes = get_matrizes_talentos(get_roster())
+    return render_template('matriz_talentos_geral.html', times=matrizes.resumo_times(), total=matrizes.contagens.tolist(), titulos=TITULOS_MATRIZ)
 
 @app.route('/comparador')
+@resposta_condicional()
 def comparador():
-    colaboradores = get_dados_completos()
-    colaboradores_ordenados = sorted(colaboradores, key=lambda x: x['Nome_completo'])
-    return render_template('comparador.html', colaboradores=colaboradores_ordenados)
+    # Os colaboradores são carregados pelo seletor à medida que se escreve (ver /api/buscar)
+    return render_template('comparador.html')
+
+@app.route('/alocacao/<int:num_turno>')
+@resposta_condicional()
+def pagina_alocacao(num_turno):
+    equipe = sorted(equipe_do_turno(num_turno), key=lambda c: c['Nome_completo'])
+    return render_template('alocacao.html', num_turno=num_turno, equipe=equipe, setores=SETORES_ALOCAVEIS, capacidades=ocupacao_por_setor(equipe))
 
 
+@app.route('/avatar/<nome_completo>.svg')
+def avatar(nome_completo):
+    svg, etag = gerar_avatar_svg(nome_completo)
+    resposta = Response(svg, mimetype='image/svg+xml')
+    resposta.set_etag(etag)
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = MAX_AGE_ESTATICOS
+    return resposta.make_conditional(request)
+
+@app.route('/miniatura/<int:colaborador_id>')
+def miniatura(colaborador_id):
+    colaborador = get_roster().por_id.get(colaborador_id)
+    if not colaborador: return "Colaborador não encontrado", 404
+    foto_url = colaborador.get('Foto_URL')
+    if not (isinstance(foto_url, str) and foto_url.strip()):
+        return redirect(f"/avatar/{quote(colaborador['Nome_completo'], safe='')}.svg")
+    if not MINIATURAS_ATIVAS: return redirect(foto_url)
+    # Depois de uma falha (ex.: sem rede) a foto original é usada durante uns minutos sem nova tentativa
+    if miniatura_falhou_recentemente(foto_url): return redirect(foto_url)
+    try:
+        caminho = obter_miniatura(foto_url.strip())
+    except Exception as e:
+        print(f"ERRO AO GERAR MINIATURA ({colaborador['Nome_completo']}): {e}")
+        traceback.print_exc()
+        registar_falha_miniatura(foto_url)
+        return redirect(foto_url)
+    resposta = send_file(os.path.abspath(caminho), mimetype='image/jpeg', conditional=True, max_age=MAX_AGE_ESTATICOS)
+    resposta.cache_control.public = True
+    resposta.cache_control.immutable = True
+    return resposta
+
 # --- ROTAS DA API ---
 @app.route('/api/salvar_avaliacao', methods=['POST'])
 def salvar_avaliacao_api():
@@ -365,28 +1451,125 @@ def salvar_avaliacao_api():
     processo_colaborador = dados.get('processo')
     sub_atributos_recebidos = dados.get('sub_atributos', {})
     sub_atributos_para_salvar = {chave: int(valor) for chave, valor in sub_atributos_recebidos.items()}
-    avaliacoes_atuais = carregar_dados_json(ARQUIVO_AVALIACOES)
-    avaliacoes_atuais[nome_colaborador] = sub_atributos_para_salvar
-    salvar_dados_json(avaliacoes_atuais, ARQUIVO_AVALIACOES)
     overall_calculado = calcular_overall_com_notas(sub_atributos_para_salvar, processo_colaborador)
-    historico_geral = carregar_dados_json(ARQUIVO_HISTORICO)
-    if nome_colaborador not in historico_geral:
-        historico_geral[nome_colaborador] = []
-    novo_registro = {"data": datetime.now().strftime('%Y-%m-%d'), "overall": overall_calculado, "sub_atributos": sub_atributos_para_salvar}
-    historico_geral[nome_colaborador].append(novo_registro)
-    salvar_dados_json(historico_geral, ARQUIVO_HISTORICO)
+    processo_registro, turno_registro = setor_turno_historico(nome_colaborador, processo_colaborador)
+    novo_registro = {
+        "data": datetime.now().strftime('%Y-%m-%d'), "overall": overall_calculado, "sub_atributos": sub_atributos_para_salvar,
+        "processo": processo_registro, "turno": turno_registro
+    }
+    def escrever():
+        armazenamento.salvar_item('avaliacoes', nome_colaborador, sub_atributos_para_salvar)
+        invalidar_cache_roster()
+        armazenamento.anexar_historico(nome_colaborador, novo_registro)
+    escrever_com_times(escrever, [(nome_colaborador, sub_atributos_para_salvar, None)])
     return jsonify({'status': 'sucesso', 'mensagem': f'Avaliação de {nome_colaborador} salva!'})
 
+@app.route('/api/salvar_avaliacoes_lote', methods=['POST'])
+def salvar_avaliacoes_lote_api():
+    # Recebe {"avaliacoes": [{nome_completo, processo, sub_atributos}, ...]} (ou a lista diretamente),
+    # valida cada entrada contra ESTRUTURA_ATRIBUTOS, calcula todos os overalls de uma vez e grava
+    # tudo com uma única escrita das avaliações e um único acréscimo ao histórico.
+    dados = request.get_json(silent=True)
+    entradas = dados.get('avaliacoes') if isinstance(dados, dict) else dados
+    if not isinstance(entradas, list) or not entradas:
+        return jsonify({'status': 'erro', 'mensagem': 'Envie uma lista de avaliações.'}), 400
+
+    resultados, validas, nomes_vistos = [], [], set()
+    sub_atributos_validos = set(motor_pontuacao.sub_atributos)
+    for indice, entrada in enumerate(entradas):
+        nome = entrada.get('nome_completo') if isinstance(entrada, dict) else None
+        resultado = {'indice': indice, 'nome_completo': nome}
+        resultados.append(resultado)
+        try:
+            if not isinstance(nome, str) or not nome.strip(): raise ValueError('Nome do colaborador não fornecido.')
+            if nome in nomes_vistos: raise ValueError('Colaborador repetido no lote.')
+            sub_atributos = entrada.get('sub_atributos')
+            if not isinstance(sub_atributos, dict) or not sub_atributos: raise ValueError('Sub-atributos não fornecidos.')
+            desconhecidos = [chave for chave in sub_atributos if chave not in sub_atributos_validos]
+            if desconhecidos: raise ValueError(f"Sub-atributos desconhecidos: {', '.join(desconhecidos)}")
+            notas = {}
+            for chave, valor in sub_atributos.items():
+                try:
+                    notas[chave] = int(valor)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Nota inválida para '{chave}'.")
+                if not 1 <= notas[chave] <= 99: raise ValueError(f"A nota de '{chave}' deve estar entre 1 e 99.")
+        except ValueError as e:
+            resultado.update({'status': 'erro', 'mensagem': str(e)})
+            continue
+        nomes_vistos.add(nome)
+        validas.append((resultado, nome, entrada.get('processo'), notas))
+
+    if validas:
+        with medir('pontuacao'):
+            medias = motor_pontuacao.medias_principais(motor_pontuacao.matriz_notas([notas for _, _, _, notas in validas]))
+            overalls_setores = motor_pontuacao.overalls_por_setor(medias)
+        data_hoje = datetime.now().strftime('%Y-%m-%d')
+        avaliacoes, registros_historico = {}, []
+        for linha, (resultado, nome, processo, notas) in enumerate(validas):
+            overall = int(overalls_setores[linha, motor_pontuacao.indice_setor(processo)])
+            avaliacoes[nome] = notas
+            processo_registro, turno_registro = setor_turno_historico(nome, processo)
+            registros_historico.append((nome, {
+                "data": data_hoje, "overall": overall, "sub_atributos": notas, "processo": processo_registro, "turno": turno_registro
+            }))
+            resultado.update({'status': 'sucesso', 'overall': overall})
+
+        def escrever():
+            armazenamento.salvar_itens('avaliacoes', avaliacoes)
+            invalidar_cache_roster()
+            armazenamento.anexar_historico_lote(registros_historico)
+        escrever_com_times(escrever, [(nome, notas, None) for nome, notas in avaliacoes.items()])
+
+    salvos = len(validas)
+    status = 'sucesso' if salvos == len(entradas) else ('parcial' if salvos else 'erro')
+    return jsonify({'status': status, 'salvos': salvos, 'erros': len(entradas) - salvos, 'resultados': resultados}), 200 if salvos else 400
+
+@app.route('/api/uploads/<id_tarefa>')
+def estado_upload_api(id_tarefa):
+    tarefa = fila_uploads.estado(id_tarefa)
+    if not tarefa:
+        return jsonify({"erro": "Tarefa não encontrada"}), 404
+    return jsonify({chave: tarefa[chave] for chave in ('id', 'nome_completo', 'estado', 'tentativas', 'erro', 'foto_url')})
+
+@app.route('/api/detalhamento/times')
+@resposta_condicional()
+def api_estatisticas_times():
+    # Mesmos agregados da página /detalhamento, servidos da visão materializada (ex.: para um wallboard).
+    # ?top=N limita o ranking de cada time aos N primeiros.
+    top = request.args.get('top', type=int)
+    stats_times, dados_agrupados = get_estatisticas_times().resumo()
+    for turno, times in stats_times.items():
+        for time_ in times:
+            ranking = dados_agrupados[turno][time_['nome_setor']]
+            time_['ranking'] = [{'id': m['id'], 'nome': m['Nome_completo'], 'overall': m['overall']} for m in (ranking[:top] if top else ranking)]
+    return jsonify(stats_times)
+
 @app.route('/api/colaborador/<int:colaborador_id>/historico')
+@resposta_condicional(com_historico=True)
 def get_historico_colaborador(colaborador_id):
-    colaboradores = get_dados_completos()
-    colaborador = next((c for c in colaboradores if c['id'] == colaborador_id), None)
+    colaborador = buscar_colaborador_por_id(colaborador_id)
     if not colaborador:
         return jsonify({"erro": "Colaborador não encontrado"}), 404
-    nome_completo = colaborador['Nome_completo']
-    historico_geral = carregar_dados_json(ARQUIVO_HISTORICO)
-    historico_do_colaborador = historico_geral.get(nome_completo, [])
-    return jsonify(historico_do_colaborador)
+    # Parâmetros opcionais: from/to (AAAA-MM-DD), limit/offset (a contar da avaliação mais recente)
+    # e fields (ex.: "data,overall"). A resposta continua a ser a lista em ordem cronológica;
+    # o total de entradas no intervalo vai no cabeçalho X-Total-Count.
+    try:
+        limite = request.args.get('limit', type=int)
+        deslocamento = request.args.get('offset', 0, type=int)
+        if (limite is not None and limite < 0) or deslocamento < 0: raise ValueError
+        de, ate = request.args.get('from'), request.args.get('to')
+        for data in (de, ate):
+            if data: datetime.strptime(data, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({"erro": "Parâmetros inválidos."}), 400
+    campos = [campo.strip() for campo in request.args.get('fields', '').split(',') if campo.strip()] or None
+    historico_do_colaborador, total = armazenamento.consultar_historico(
+        colaborador['Nome_completo'], de=de, ate=ate, limite=limite, deslocamento=deslocamento, campos=campos
+    )
+    resposta = jsonify(historico_do_colaborador)
+    resposta.headers['X-Total-Count'] = str(total)
+    return resposta
 
 @app.route('/api/colaborador/<int:colaborador_id>/salvar_insignias', methods=['POST'])
 def salvar_insignias_api(colaborador_id):
@@ -395,9 +1578,9 @@ def salvar_insignias_api(colaborador_id):
     ids_insignias = dados.get('insignias', [])
     if not nome_colaborador:
         return jsonify({'status': 'erro', 'mensagem': 'Nome do colaborador não fornecido.'}), 400
-    insignias_gerais = carregar_dados_json(ARQUIVO_INSIGNIAS)
-    insignias_gerais[nome_colaborador] = ids_insignias
-    salvar_dados_json(insignias_gerais, ARQUIVO_INSIGNIAS)
+    # As insígnias não mexem nos times: a visão só passa para a nova assinatura
+    escrever_com_times(lambda: armazenamento.salvar_item('insignias', nome_colaborador, ids_insignias))
+    invalidar_cache_roster()
     return jsonify({'status': 'sucesso', 'mensagem': 'Insígnias salvas com sucesso!'})
 
 @app.route('/api/colaborador/pdi', methods=['POST'])
@@ -407,28 +1590,167 @@ def gerir_pdi_api():
     acao = dados.get('acao')
     if not nome_colaborador or not acao:
         return jsonify({'status': 'erro', 'mensagem': 'Dados insuficientes.'}), 400
-    pdi_geral = carregar_dados_json(ARQUIVO_PDI)
-    pdi_do_colaborador = pdi_geral.get(nome_colaborador, [])
+    # Cada alteração lê e grava o PDI sob o mesmo bloqueio (ver armazenamento.atualizar_item)
     if acao == 'adicionar':
-        nova_acao = {"id": int(time.time()), "descricao": dados.get('descricao', 'Ação não descrita'), "prazo": dados.get('prazo', ''), "status": "A Fazer"}
-        pdi_do_colaborador.append(nova_acao)
-        pdi_geral[nome_colaborador] = pdi_do_colaborador
-        salvar_dados_json(pdi_geral, ARQUIVO_PDI)
+        nova_acao = {"id": uuid.uuid4().hex, "descricao": dados.get('descricao', 'Ação não descrita'), "prazo": dados.get('prazo', ''), "status": "A Fazer"}
+        escrever_com_times(lambda: armazenamento.atualizar_item('pdi', nome_colaborador, lambda pdi: pdi + [nova_acao], []))
+        invalidar_cache_roster()
         return jsonify({'status': 'sucesso', 'mensagem': 'Ação adicionada ao PDI!', 'nova_acao': nova_acao})
-    elif acao == 'atualizar_status':
-        pdi_id, novo_status = dados.get('pdi_id'), dados.get('novo_status')
-        for item in pdi_do_colaborador:
-            if item.get('id') == pdi_id: item['status'] = novo_status; break
-        pdi_geral[nome_colaborador] = pdi_do_colaborador
-        salvar_dados_json(pdi_geral, ARQUIVO_PDI)
-        return jsonify({'status': 'sucesso', 'mensagem': 'Status da ação atualizado!'})
+    # Ações antigas têm ids inteiros (int(time.time())); as novas, uuid em hexadecimal.
+    # Um nome ou id desconhecido devolve SEM_ALTERACAO: nada é gravado e a versão dos dados não muda.
+    pdi_id = str(dados.get('pdi_id'))
+    if acao == 'atualizar_status':
+        novo_status = dados.get('novo_status')
+        def atualizar(pdi):
+            for item in pdi:
+                if str(item.get('id')) == pdi_id:
+                    item['status'] = novo_status
+                    return pdi
+            return SEM_ALTERACAO
+        mensagem = 'Status da ação atualizado!'
     elif acao == 'apagar':
-        pdi_id = dados.get('pdi_id')
-        pdi_do_colaborador = [item for item in pdi_do_colaborador if item.get('id') != pdi_id]
-        pdi_geral[nome_colaborador] = pdi_do_colaborador
-        salvar_dados_json(pdi_geral, ARQUIVO_PDI)
-        return jsonify({'status': 'sucesso', 'mensagem': 'Ação apagada do PDI!'})
-    return jsonify({'status': 'erro', 'mensagem': 'Ação desconhecida.'}), 400
+        def atualizar(pdi):
+            restantes = [item for item in pdi if str(item.get('id')) != pdi_id]
+            return restantes if len(restantes) < len(pdi) else SEM_ALTERACAO
+        mensagem = 'Ação apagada do PDI!'
+    else:
+        return jsonify({'status': 'erro', 'mensagem': 'Ação desconhecida.'}), 400
+    if escrever_com_times(lambda: armazenamento.atualizar_item('pdi', nome_colaborador, atualizar, [])) is SEM_ALTERACAO:
+        return jsonify({'status': 'erro', 'mensagem': 'Ação do PDI não encontrada.'}), 404
+    invalidar_cache_roster()
+    return jsonify({'status': 'sucesso', 'mensagem': mensagem})
+
+@app.route('/api/pdi')
+def consultar_pdi_api():
+    # ?processo=Picking&turno=2&dias=7&status=A Fazer,Em Andamento -> ações atrasadas (prazo antes de
+    # hoje) e a vencer nos próximos "dias" dias, do time, do setor, do turno ou de todos.
+    # Sem resposta condicional: "atrasada" depende do dia de hoje e não só dos dados.
+    try:
+        hoje = date.fromisoformat(request.args['hoje']) if request.args.get('hoje') else date.today()
+        dias = request.args.get('dias', 7, type=int)
+        turno = request.args.get('turno', type=int)
+        if 'turno' in request.args and turno is None or dias < 0: raise ValueError
+    except ValueError:
+        return jsonify({"erro": "Parâmetros inválidos."}), 400
+    status = [s.strip() for s in request.args['status'].split(',') if s.strip()] if request.args.get('status') else None
+    filtros = {'processo': request.args.get('processo') or None, 'turno': turno, 'status': status}
+    indice = get_indice_pdi(get_roster())
+
+    def serializar(itens):
+        return [{
+            **acao, 'nome_completo': c['Nome_completo'], 'colaborador_id': c['id'], 'processo': c.get('Processo') if isinstance(c.get('Processo'), str) else None,
+            'turno': c.get('Turno_Num'), 'dias_para_prazo': (date.fromisoformat(prazo) - hoje).days,
+        } for prazo, _, c, acao in itens]
+
+    return jsonify({
+        'hoje': hoje.isoformat(),
+        'atrasadas': serializar(indice.consultar(ate=hoje.isoformat(), **filtros)),
+        'proximas': serializar(indice.consultar(de=hoje.isoformat(), ate=(hoje + timedelta(days=dias + 1)).isoformat(), **filtros)),
+    })
+
+@app.route('/api/overall_lote')
+@resposta_condicional()
+def overall_lote_api():
+    # ?ids=1,2,3&setores=PICKING,Loja -> overall simulado de cada colaborador em cada setor, tirado
+    # da matriz já calculada no snapshot do roster (a mesma usada na prévia do detalhe_colaborador).
+    # Sem "setores" devolve todos os setores de PESOS.
+    try:
+        ids = list(dict.fromkeys(int(i) for i in request.args.get('ids', '').split(',') if i.strip()))
+    except ValueError:
+        return jsonify({"erro": "Parâmetro 'ids' inválido."}), 400
+    if not ids or len(ids) > MAX_IDS_OVERALL_LOTE:
+        return jsonify({"erro": f"Envie de 1 a {MAX_IDS_OVERALL_LOTE} ids."}), 400
+    setores = [s.strip() for s in request.args.get('setores', '').split(',') if s.strip()] or [s for s in PESOS if s != 'DEFAULT']
+    # Um setor sem pesos próprios daria os pesos DEFAULT sem aviso: fica de fora e é listado à parte,
+    # como os ids não encontrados (os seletores dos cards pedem todos os setores num só pedido)
+    setores_desconhecidos = [setor for setor in setores if not motor_pontuacao.tem_setor(setor)]
+    setores = [setor for setor in setores if motor_pontuacao.tem_setor(setor)]
+    colunas = [motor_pontuacao.indice_setor(setor) for setor in setores]
+
+    roster = get_roster()
+    overalls, nao_encontrados = {}, []
+    for colaborador_id in ids:
+        linha = roster.linha_por_id.get(colaborador_id)
+        if linha is None:
+            nao_encontrados.append(colaborador_id)
+            continue
+        valores = roster.overalls_setores[linha, colunas]
+        overalls[str(colaborador_id)] = {setor: int(valor) for setor, valor in zip(setores, valores)}
+    return jsonify({"overalls": overalls, "nao_encontrados": nao_encontrados, "setores_desconhecidos": setores_desconhecidos})
+
+@app.route('/api/alocacao', methods=['POST'])
+def alocacao_api():
+    # Recebe {"turno": 1, "capacidades": {setor: vagas}, "fixados": {id: setor ou null}} e devolve a
+    # alocação ótima do turno e a lista de mudanças em relação a hoje (cada uma com o URL do mudar_setor).
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return jsonify({'status': 'erro', 'mensagem': 'O corpo do pedido tem de ser um objeto JSON.'}), 400
+    try:
+        num_turno = int(dados.get('turno'))
+        capacidades = dados.get('capacidades')
+        if capacidades is None: capacidades = {}
+        if not isinstance(capacidades, dict): raise ValueError("'capacidades' tem de ser um objeto {setor: vagas}.")
+        for setor, quantidade in capacidades.items():
+            if isinstance(quantidade, bool) or not isinstance(quantidade, int): raise ValueError(f"A capacidade de {setor} tem de ser um número inteiro.")
+        fixados = dados.get('fixados') or {}
+        if isinstance(fixados, list): fixados = {colaborador_id: None for colaborador_id in fixados}
+        if not isinstance(fixados, dict): raise ValueError("'fixados' tem de ser um objeto {id: setor} ou uma lista de ids.")
+        resultado = calcular_alocacao(num_turno, capacidades, {int(k): v for k, v in fixados.items()})
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'erro', 'mensagem': str(e) or 'Dados inválidos.'}), 400
+    for mudanca in resultado['mudancas']:
+        mudanca['url_mudar_setor'] = url_for('mudar_setor', nome_completo=mudanca['nome'])
+    return jsonify(resultado)
+
+@app.route('/api/tendencias')
+@resposta_condicional(com_historico=True)
+def tendencias_api():
+    # ?de=AAAA-MM&ate=AAAA-MM&processo=Picking&turno=1&agrupar=processo,turno
+    # "agrupar" aceita processo, turno, ambos ou vazio (total do mês).
+    try:
+        de, ate = request.args.get('de'), request.args.get('ate')
+        for data in (de, ate):
+            if data: datetime.strptime(data[:7], '%Y-%m')
+        turno = request.args.get('turno', type=int)
+        if 'turno' in request.args and turno is None: raise ValueError
+        agrupar = tuple(campo.strip() for campo in request.args.get('agrupar', 'processo,turno').split(',') if campo.strip())
+        if any(campo not in ('processo', 'turno') for campo in agrupar): raise ValueError
+    except ValueError:
+        return jsonify({"erro": "Parâmetros inválidos."}), 400
+    series = tendencias_historico.consultar(
+        de=de[:7] if de else None, ate=ate[:7] if ate else None,
+        processo=request.args.get('processo'), turno=turno, agrupar=agrupar
+    )
+    return jsonify(series)
+
+@app.route('/api/matriz_talentos')
+@resposta_condicional()
+def matriz_talentos_api():
+    # Contagens da 9-box de todos os times (linha 0 = Técnica alta, coluna 0 = Comportamento baixo).
+    # Com ?membros=1 cada time traz também os ids de cada célula.
+    roster = get_roster()
+    matrizes = get_matrizes_talentos(roster)
+    times = matrizes.resumo_times(roster.colaboradores if request.args.get('membros') == '1' else None)
+    return jsonify({'titulos': TITULOS_MATRIZ, 'total': matrizes.contagens.tolist(), 'times': times})
+
+@app.route('/api/buscar')
+@resposta_condicional()
+def buscar_api():
+    # ?q=ana pick&limite=20&offset=0 -> colaboradores cujo nome, setor, turno ou líder contêm
+    # palavras começadas por cada termo, sem distinguir acentos nem maiúsculas.
+    limite = request.args.get('limite', 20, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    if not 1 <= limite <= MAX_RESULTADOS_BUSCA or offset < 0:
+        return jsonify({"erro": f"Use limite de 1 a {MAX_RESULTADOS_BUSCA} e offset >= 0."}), 400
+    roster = get_roster()
+    linhas = get_indice_busca(roster).buscar(request.args.get('q', ''))
+    resultados = []
+    for linha in linhas[offset:offset + limite]:
+        c = roster.colaboradores[linha]
+        resultado = {campo: c.get(campo) if isinstance(c.get(campo), str) else None for campo in ('Nome_completo', 'Processo', 'Turno', 'Lider')}
+        resultado.update({'id': c['id'], 'foto': c['foto'], 'overall': c['overall']})
+        resultados.append(resultado)
+    return jsonify({'total': len(linhas), 'offset': offset, 'limite': limite, 'resultados': resultados})
 
 @app.route('/api/comparar', methods=['POST'])
 def api_comparar():
@@ -436,17 +1758,17 @@ def api_comparar():
         ids_selecionados = request.json.get('ids', [])
         if not 2 <= len(ids_selecionados) <= 4:
             return jsonify({"erro": "Selecione de 2 a 4 colaboradores."}), 400
-        ids_selecionados = [int(id_str) for id_str in ids_selecionados]
-        colaboradores_todos = get_dados_completos()
-        colaboradores_selecionados = [c for c in colaboradores_todos if c['id'] in ids_selecionados]
+        ids_selecionados = list(dict.fromkeys(int(id_str) for id_str in ids_selecionados))
+        por_id = get_roster().por_id
+        colaboradores_selecionados = [por_id[i] for i in ids_selecionados if i in por_id]
         cards_data_serializable = []
         for c in colaboradores_selecionados:
             colaborador_limpo = {}
             for key, value in c.items():
-                if hasattr(value, 'item'): colaborador_limpo[key] = value.item()
-                elif pd.isna(value): colaborador_limpo[key] = None
+                if isinstance(value, AtributosDetalhados): colaborador_limpo[key] = value.para_lista()
+                elif hasattr(value, 'item'): colaborador_limpo[key] = value.item()
+                elif not isinstance(value, (list, dict)) and pd.isna(value): colaborador_limpo[key] = None
                 else: colaborador_limpo[key] = value
-            colaborador_limpo['overall'] = calcular_overall_individual(colaborador_limpo, PESOS)
             cards_data_serializable.append(colaborador_limpo)
         dados_grafico = {'labels': list(ESTRUTURA_ATRIBUTOS.keys()), 'datasets': []}
         cores = ['#007bff', '#28a745', '#ffc107', '#dc3545', '#17a2b8', '#6f42c1']
@@ -464,52 +1786,161 @@ def api_comparar():
         return jsonify({"erro": "Ocorreu um erro interno no servidor."}), 500
 
 
-# Substitui a tua função download_consolidado por esta versão melhorada
+@app.route('/dev/cache_roster')
+def cache_roster_stats():
+    return jsonify({**estatisticas_cache_roster(), 'avatares': gerar_avatar_svg.cache_info()._asdict(), 'fragmentos': cache_fragmentos.estatisticas()})
+
+
+# --- RELATÓRIO CONSOLIDADO ---
+# Guarda os últimos relatórios gerados, indexados pela versão dos dados (stat aos ficheiros ou
+# contador da base SQLite). Uma descarga repetida sem alterações responde 304 ou devolve os bytes
+# guardados sem ler a planilha.
+FORMATOS_RELATORIO = {
+    'xlsx': ('Colaboradores_Consolidado.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('Colaboradores_Consolidado.csv', 'text/csv; charset=utf-8'),
+}
+MAX_RELATORIOS_EM_CACHE = 4
+_lock_cache_relatorio = threading.Lock()
+_cache_relatorio = {}
+
+def versao_relatorio(formato):
+    """Versão do relatório: muda com os dados de entrada (incluindo as mudanças de setor) e com o código."""
+    chave, _ = armazenamento.versao_dados(com_mudancas_setor=True)
+    return hashlib.sha256(repr((VERSAO_CODIGO, chave, formato)).encode('utf-8')).hexdigest()[:32]
+
+def _consolidar_colaboradores(df_colaboradores, avaliacoes, mudancas_setor):
+    # 1. Aplica as mudanças de setor pendentes
+    if mudancas_setor:
+        print(f"Aplicando {len(mudancas_setor)} mudanças de setor pendentes...")
+        for nome, mudanca in mudancas_setor.items():
+            df_colaboradores.loc[df_colaboradores['Nome_completo'] == nome, 'Processo'] = mudanca['novo_setor']
+
+    # 2. Consolida as avaliações
+    if avaliacoes:
+        df_avaliacoes = pd.DataFrame.from_dict(avaliacoes, orient='index')
+        df_avaliacoes.reset_index(inplace=True)
+        df_avaliacoes.rename(columns={'index': 'Nome_completo'}, inplace=True)
+
+        df_colaboradores = df_colaboradores.set_index('Nome_completo')
+        df_avaliacoes = df_avaliacoes.set_index('Nome_completo')
+
+        df_colaboradores.update(df_avaliacoes)
+        for col in df_avaliacoes.columns:
+            if col not in df_colaboradores.columns:
+                df_colaboradores[col] = df_avaliacoes[col]
+
+        df_colaboradores.reset_index(inplace=True)
+    return df_colaboradores
+
+def gerar_relatorio_consolidado(formato):
+    """Devolve (conteúdo em bytes, versão). O ficheiro é montado em memória, nada é escrito no disco."""
+    # A versão é lida antes dos dados: se mudarem pelo meio, o conteúdo guardado é o mais recente
+    versao = versao_relatorio(formato)
+    with _lock_cache_relatorio:
+        if versao in _cache_relatorio: return _cache_relatorio[versao], versao
+
+    df_colaboradores = armazenamento.ler_colaboradores()
+    avaliacoes = armazenamento.carregar('avaliacoes')
+    mudancas_setor = armazenamento.carregar('mudancas_setor')
+    df_consolidado = _consolidar_colaboradores(df_colaboradores, avaliacoes, mudancas_setor)
+    buffer = io.BytesIO()
+    if formato == 'csv':
+        # utf-8-sig para o Excel reconhecer os acentos ao abrir o CSV
+        buffer.write(df_consolidado.to_csv(index=False).encode('utf-8-sig'))
+    else:
+        df_consolidado.to_excel(buffer, index=False)
+    conteudo = buffer.getvalue()
+
+    with _lock_cache_relatorio:
+        _cache_relatorio[versao] = conteudo
+        while len(_cache_relatorio) > MAX_RELATORIOS_EM_CACHE:
+            _cache_relatorio.pop(next(iter(_cache_relatorio)))
+    return conteudo, versao
 
 @app.route('/dev/download_consolidado')
 def download_consolidado():
+    formato = request.args.get('formato', 'xlsx').lower()
+    if formato not in FORMATOS_RELATORIO:
+        return jsonify({"erro": f"Formato inválido. Use um de: {', '.join(FORMATOS_RELATORIO)}"}), 400
     try:
-        # 1. Carrega os dados base
-        df_colaboradores = pd.read_excel(ARQUIVO_COLABORADORES)
-        avaliacoes = carregar_dados_json(ARQUIVO_AVALIACOES)
-        mudancas_setor = carregar_dados_json(ARQUIVO_MUDANCAS_SETOR)
-
-        # 2. Aplica as mudanças de setor pendentes
-        if mudancas_setor:
-            print(f"Aplicando {len(mudancas_setor)} mudanças de setor pendentes...")
-            for nome, mudanca in mudancas_setor.items():
-                df_colaboradores.loc[df_colaboradores['Nome_completo'] == nome, 'Processo'] = mudanca['novo_setor']
-
-        # 3. Consolida as avaliações (como antes)
-        if avaliacoes:
-            df_avaliacoes = pd.DataFrame.from_dict(avaliacoes, orient='index')
-            df_avaliacoes.reset_index(inplace=True)
-            df_avaliacoes.rename(columns={'index': 'Nome_completo'}, inplace=True)
-
-            df_colaboradores = df_colaboradores.set_index('Nome_completo')
-            df_avaliacoes = df_avaliacoes.set_index('Nome_completo')
-
-            df_colaboradores.update(df_avaliacoes)
-            for col in df_avaliacoes.columns:
-                if col not in df_colaboradores.columns:
-                    df_colaboradores[col] = df_avaliacoes[col]
-
-            df_colaboradores.reset_index(inplace=True)
-
-        # 4. Salva e envia o ficheiro final
-        nome_ficheiro_saida = 'Colaboradores_Consolidado.xlsx'
-        df_colaboradores.to_excel(nome_ficheiro_saida, index=False)
-
-        return send_from_directory(
-            directory='.',
-            path=nome_ficheiro_saida,
-            as_attachment=True
+        # O cliente que já tem esta versão recebe 304 sem que nada seja lido
+        versao = versao_relatorio(formato)
+        if request.if_none_match and request.if_none_match.contains(versao):
+            resposta = app.response_class(status=304)
+            resposta.set_etag(versao)
+            resposta.headers['Cache-Control'] = 'no-cache'
+            return resposta
+        conteudo, versao = gerar_relatorio_consolidado(formato)
+        nome_ficheiro_saida, tipo = FORMATOS_RELATORIO[formato]
+        # send_file também responde 304 quando o If-None-Match bate com o ETag
+        resposta = send_file(
+            io.BytesIO(conteudo),
+            mimetype=tipo,
+            as_attachment=True,
+            download_name=nome_ficheiro_saida,
+            etag=versao,
+            conditional=True
         )
+        resposta.headers['Cache-Control'] = 'no-cache'
+        return resposta
 
     except Exception as e:
         print(f"ERRO AO GERAR RELATÓRIO: {e}")
         traceback.print_exc()
-        return "Ocorreu um erro interno ao gerar o relatório.", 500    
+        return "Ocorreu um erro interno ao gerar o relatório.", 500
+
+# --- ARRANQUE DOS WORKERS ---
+# Para o gunicorn:  gunicorn --preload 'app:criar_app()'
+# criar_app() monta o roster (e os índices que dependem dele) antes de os workers servirem o
+# primeiro pedido; com --preload isso acontece uma única vez no processo principal e os
+# workers herdam o snapshot no fork. O trabalho com threads (retomar uploads pendentes) fica
+# para o primeiro pedido de cada processo, porque as threads não sobrevivem ao fork.
+# O tempo até ao primeiro pedido de cada processo aparece no log e em /metrics.
+_arranque = {'inicio': _inicio_importacao, 'pid': None, 'primeiro_pedido': False}
+_lock_arranque = threading.Lock()
+
+def _processo_criado():
+    _arranque.update({'inicio': time.perf_counter(), 'pid': None, 'primeiro_pedido': False})
+
+if hasattr(os, 'register_at_fork'): os.register_at_fork(after_in_child=_processo_criado)
+
+def aquecer_caches():
+    """Monta o snapshot do roster e as visões derivadas dele; devolve a duração em segundos."""
+    inicio = time.perf_counter()
+    roster = get_roster()
+    get_estatisticas_times()
+    get_indice_busca(roster)
+    get_matrizes_talentos(roster)
+    get_indice_pdi(roster)
+    duracao = time.perf_counter() - inicio
+    if metricas.ATIVO: metricas.registo.registar_arranque('aquecimento', duracao)
+    print(f"Caches aquecidos em {duracao:.2f}s ({len(roster.colaboradores)} colaboradores).")
+    return duracao
+
+def criar_app(aquecer=None):
+    """Ponto de entrada para o gunicorn. CAROMETRO_AQUECER=0 desliga o aquecimento."""
+    if aquecer is None: aquecer = os.getenv('CAROMETRO_AQUECER', '1') == '1'
+    if aquecer: aquecer_caches()
+    return app
+
+@app.before_request
+def preparar_processo():
+    if _arranque['pid'] == os.getpid(): return
+    with _lock_arranque:
+        if _arranque['pid'] == os.getpid(): return
+        _arranque['pid'] = os.getpid()
+    fila_uploads.retomar_pendentes()
+
+@app.after_request
+def registar_primeiro_pedido(resposta):
+    if not _arranque['primeiro_pedido']:
+        _arranque['primeiro_pedido'] = True
+        duracao = time.perf_counter() - _arranque['inicio']
+        if metricas.ATIVO: metricas.registo.registar_arranque('primeiro_pedido', duracao)
+        print(f"Processo {os.getpid()}: primeiro pedido ({request.path}) respondido {duracao:.2f}s após o arranque.")
+    return resposta
+
+if metricas.ATIVO: metricas.registo.registar_arranque('importacao', time.perf_counter() - _inicio_importacao)
 
 # --- INICIALIZAÇÃO DO SERVIDOR ---
 if __name__ == '__main__':
@@ -0,0 +1,659 @@
+# armazenamento.py
+"""
+Camada de armazenamento do Carômetro.
+
+A aplicação fala apenas com a interface abaixo; há duas implementações:
+  - ArmazenamentoArquivos: o formato original (Colaboradores.xlsx + ficheiros JSON).
+  - ArmazenamentoSQLite: uma única base SQLite indexada por nome, setor e turno,
+    onde cada alteração toca apenas as linhas afetadas.
+
+Coleções por colaborador (chave = Nome_completo):
+  'avaliacoes'     -> {sub_atributo: nota}
+  'historico'      -> [registo, ...]
+  'pdi'            -> [ação, ...]
+  'insignias'      -> [id_insignia, ...]
+  'mudancas_setor' -> {'novo_setor': ...}
+
+No modo de ficheiros, todas as escritas são serializadas entre processos (bloqueio de
+ficheiro) e atómicas (ficheiro temporário + rename). O histórico é um log JSON Lines
+só de acréscimo: cada avaliação acrescenta uma linha em vez de regravar o ficheiro todo.
+
+Cada colaborador tem um 'ID' inteiro estável, gravado junto com os dados: não muda
+quando alguém é adicionado ou desligado, por isso URLs e caches continuam válidos.
+"""
+import json
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+
+from metricas import medir
+
+COLECOES = ('avaliacoes', 'historico', 'pdi', 'insignias', 'mudancas_setor')
+COLUNA_ID = 'ID'
+# Devolvido pela função de atualizar_item() quando não há nada a alterar: nada é gravado
+# e a versão dos dados não muda
+SEM_ALTERACAO = object()
+
+
+# --- FUNÇÕES AUXILIARES ---
+def carregar_dados_json(arquivo):
+    with medir('carregar_json'):
+        try:
+            with open(arquivo, 'r', encoding='utf-8') as f: return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError): return {}
+
+def salvar_dados_json(data, arquivo):
+    with medir('salvar_json'):
+        conteudo = json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
+        escrever_atomico(arquivo, lambda f: f.write(conteudo))
+
+def escrever_atomico(arquivo, escrever):
+    """Escreve num temporário da mesma pasta e só depois substitui o ficheiro final,
+    para que uma falha a meio nunca deixe o ficheiro truncado."""
+    pasta = os.path.dirname(os.path.abspath(arquivo))
+    fd, temporario = tempfile.mkstemp(dir=pasta, prefix='.tmp-', suffix=os.path.splitext(arquivo)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            escrever(f)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(temporario, os.stat(arquivo).st_mode)
+        except FileNotFoundError:
+            os.chmod(temporario, 0o644)
+        os.replace(temporario, arquivo)
+    except BaseException:
+        if os.path.exists(temporario): os.remove(temporario)
+        raise
+
+_locks_threads = {}
+_lock_locks_threads = threading.Lock()
+
+@contextmanager
+def bloqueio_arquivo(arquivo):
+    """Bloqueio exclusivo entre threads e entre processos (ex.: workers do gunicorn)."""
+    caminho_lock = os.path.abspath(arquivo) + '.lock'
+    with _lock_locks_threads:
+        lock_thread = _locks_threads.setdefault(caminho_lock, threading.Lock())
+    with lock_thread, open(caminho_lock, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _valor_serializavel(valor):
+    # Converte os tipos do pandas/numpy (NaN, Timestamp, int64...) para tipos JSON.
+    if valor is None: return None
+    if isinstance(valor, float) and math.isnan(valor): return None
+    if valor is pd.NaT: return None
+    if hasattr(valor, 'isoformat'): return valor.isoformat()
+    if hasattr(valor, 'item'): return valor.item()
+    return valor
+
+
+def _filtrar_historico(entradas, de, ate, limite, deslocamento):
+    """Recebe (data, referência) em ordem cronológica e devolve a janela pedida e o total no intervalo.
+    O deslocamento conta a partir da entrada mais recente, para que as páginas seguintes tragam as mais antigas."""
+    if de or ate:
+        entradas = [e for e in entradas if e[0] and (not de or e[0] >= de) and (not ate or e[0] <= ate)]
+    total = len(entradas)
+    fim = total - (deslocamento or 0)
+    if fim <= 0: return [], total
+    inicio = 0 if limite is None else max(0, fim - limite)
+    return entradas[inicio:fim], total
+
+def _projetar(registros, campos):
+    if not campos: return registros
+    return [{k: r[k] for k in campos if k in r} for r in registros]
+
+def _atribuir_ids(df):
+    df = df.copy()
+    if COLUNA_ID not in df.columns:
+        df.insert(0, COLUNA_ID, pd.NA)
+    ids = pd.to_numeric(df[COLUNA_ID], errors='coerce')
+    proximo = int(ids.max()) + 1 if ids.notna().any() else 1
+    for indice in df.index[ids.isna()]:
+        ids.at[indice] = proximo
+        proximo += 1
+    df[COLUNA_ID] = ids.astype(int)
+    return df
+
+
+# --- IMPLEMENTAÇÃO EM FICHEIROS (XLSX + JSON) ---
+class ArmazenamentoArquivos:
+    tipo = 'arquivos'
+
+    def __init__(self, arquivo_colaboradores, arquivos_json):
+        self.arquivo_colaboradores = arquivo_colaboradores
+        self.arquivos_json = dict(arquivos_json)
+        # O historico_avaliacoes.json antigo continua a ser lido, mas as novas entradas vão para o log.
+        self.arquivos_json.setdefault('historico_log', os.path.splitext(self.arquivos_json.get('historico', 'historico_avaliacoes'))[0] + '.jsonl')
+        # Índice do log: nome -> [(data, offset da linha)], atualizado lendo apenas os bytes novos
+        self._lock_indice_historico = threading.Lock()
+        self._indice_historico = {}
+        self._indice_historico_posicao = 0
+        self._indice_historico_ficheiro = None
+        self._historico_legado = (None, {})
+
+    def assinatura(self):
+        """Identifica o estado atual dos dados do roster (mtime e tamanho dos ficheiros)."""
+        assinatura = []
+        for arquivo in (self.arquivo_colaboradores, self.arquivos_json['avaliacoes'], self.arquivos_json['insignias'], self.arquivos_json['pdi']):
+            try:
+                st = os.stat(arquivo)
+                assinatura.append((arquivo, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                assinatura.append((arquivo, None, None))
+        return tuple(assinatura)
+
+    def versao_dados(self, com_historico=False, com_mudancas_setor=False):
+        """
+        (assinatura, instante da última alteração em segundos) para respostas condicionais.
+        Com com_historico=True inclui também os ficheiros do histórico de avaliações e com
+        com_mudancas_setor=True o das mudanças de setor pendentes.
+        """
+        assinatura = self.assinatura()
+        extras = []
+        if com_historico: extras += [self.arquivos_json['historico'], self.arquivos_json['historico_log']]
+        if com_mudancas_setor: extras.append(self.arquivos_json['mudancas_setor'])
+        for arquivo in extras:
+            try:
+                st = os.stat(arquivo)
+                assinatura += ((arquivo, st.st_mtime_ns, st.st_size),)
+            except FileNotFoundError:
+                assinatura += ((arquivo, None, None),)
+        modificado_em = max((mtime for _, mtime, _ in assinatura if mtime is not None), default=0) / 1e9
+        return assinatura, modificado_em
+
+    # Colaboradores
+    def ler_colaboradores(self):
+        with medir('read_excel'):
+            df = pd.read_excel(self.arquivo_colaboradores)
+        if COLUNA_ID not in df.columns or df[COLUNA_ID].isna().any():
+            with bloqueio_arquivo(self.arquivo_colaboradores):
+                df = self._ler_colaboradores()
+        return df
+
+    def _ler_colaboradores(self):
+        """Lê a planilha e grava IDs nas linhas que ainda não têm. Deve ser chamado com o bloqueio
+        da planilha já obtido (o bloqueio não é reentrante)."""
+        with medir('read_excel'):
+            df = pd.read_excel(self.arquivo_colaboradores)
+        if COLUNA_ID not in df.columns or df[COLUNA_ID].isna().any():
+            # Migração única: atribui IDs às linhas que ainda não têm e grava-os na planilha.
+            # A atribuição segue a ordem das linhas, por isso é idempotente entre processos.
+            df = _atribuir_ids(df)
+            self._gravar_colaboradores(df)
+        return df
+
+    def _gravar_colaboradores(self, df):
+        with medir('salvar_excel'):
+            escrever_atomico(self.arquivo_colaboradores, lambda f: df.to_excel(f, index=False, engine='openpyxl'))
+
+    def gravar_colaboradores(self, df):
+        with bloqueio_arquivo(self.arquivo_colaboradores):
+            self._gravar_colaboradores(df)
+
+    def salvar_colaborador(self, nome_completo, campos):
+        """Atualiza os campos do colaborador ou acrescenta-o se ainda não existir."""
+        with bloqueio_arquivo(self.arquivo_colaboradores):
+            self._salvar_colaborador(nome_completo, campos)
+
+    def _salvar_colaborador(self, nome_completo, campos):
+        df = self._ler_colaboradores()
+        if nome_completo in df['Nome_completo'].values:
+            for key, value in campos.items():
+                df.loc[df['Nome_completo'] == nome_completo, key] = value
+        else:
+            novo_id = int(df[COLUNA_ID].max()) + 1 if len(df) else 1
+            novo_df = pd.DataFrame([{COLUNA_ID: novo_id, 'Nome_completo': nome_completo, **campos}])
+            df = pd.concat([df, novo_df], ignore_index=True)
+        self._gravar_colaboradores(df)
+
+    # Coleções JSON
+    def carregar(self, colecao):
+        if colecao == 'historico':
+            historico_geral = carregar_dados_json(self.arquivos_json['historico'])
+            for nome_completo, registro in self._ler_log_historico():
+                historico_geral.setdefault(nome_completo, []).append(registro)
+            return historico_geral
+        return carregar_dados_json(self.arquivos_json[colecao])
+
+    def carregar_item(self, colecao, nome_completo, padrao=None):
+        return self.carregar(colecao).get(nome_completo, padrao)
+
+    def salvar_item(self, colecao, nome_completo, valor):
+        self.salvar_itens(colecao, {nome_completo: valor})
+
+    def salvar_itens(self, colecao, itens):
+        """Grava vários colaboradores de uma vez, com uma única reescrita do ficheiro."""
+        if colecao == 'historico':
+            raise ValueError("O histórico é só de acréscimo; use anexar_historico().")
+        arquivo = self.arquivos_json[colecao]
+        with bloqueio_arquivo(arquivo):
+            dados = carregar_dados_json(arquivo)
+            dados.update(itens)
+            salvar_dados_json(dados, arquivo)
+
+    def atualizar_item(self, colecao, nome_completo, atualizar, padrao=None):
+        """Lê o item, aplica atualizar(valor) e grava o resultado sob o mesmo bloqueio, para que
+        duas alterações simultâneas (ex.: em workers diferentes) não se percam. Devolve o novo valor
+        (ou SEM_ALTERACAO, se foi isso que atualizar devolveu)."""
+        if colecao == 'historico':
+            raise ValueError("O histórico é só de acréscimo; use anexar_historico().")
+        arquivo = self.arquivos_json[colecao]
+        with bloqueio_arquivo(arquivo):
+            dados = carregar_dados_json(arquivo)
+            valor = atualizar(dados.get(nome_completo, padrao))
+            if valor is SEM_ALTERACAO: return valor
+            dados[nome_completo] = valor
+            salvar_dados_json(dados, arquivo)
+        return valor
+
+    # Histórico (log JSON Lines só de acréscimo)
+    def _ler_log_historico(self):
+        try:
+            with open(self.arquivos_json['historico_log'], 'r', encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue  # linha incompleta de uma escrita interrompida
+                    yield registro.pop('nome_completo'), registro
+        except FileNotFoundError:
+            return
+
+    def _atualizar_indice_historico(self):
+        arquivo = self.arquivos_json['historico_log']
+        try:
+            st = os.stat(arquivo)
+        except FileNotFoundError:
+            self._indice_historico, self._indice_historico_posicao, self._indice_historico_ficheiro = {}, 0, None
+            return
+        ficheiro = (st.st_dev, st.st_ino)
+        if ficheiro != self._indice_historico_ficheiro or st.st_size < self._indice_historico_posicao:
+            self._indice_historico, self._indice_historico_posicao, self._indice_historico_ficheiro = {}, 0, ficheiro
+        if st.st_size == self._indice_historico_posicao:
+            return
+        with open(arquivo, 'rb') as f:
+            f.seek(self._indice_historico_posicao)
+            posicao = self._indice_historico_posicao
+            for linha in f:
+                if not linha.endswith(b'\n'):
+                    break  # escrita ainda em curso; será indexada na próxima consulta
+                try:
+                    registro = json.loads(linha)
+                    self._indice_historico.setdefault(registro['nome_completo'], []).append((registro.get('data'), posicao))
+                except (json.JSONDecodeError, KeyError):
+                    pass
+                posicao += len(linha)
+            self._indice_historico_posicao = posicao
+
+    def _historico_legado_por_nome(self):
+        arquivo = self.arquivos_json['historico']
+        try:
+            st = os.stat(arquivo)
+            assinatura = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return {}
+        if self._historico_legado[0] != assinatura:
+            self._historico_legado = (assinatura, carregar_dados_json(arquivo))
+        return self._historico_legado[1]
+
+    def consultar_historico(self, nome_completo, de=None, ate=None, limite=None, deslocamento=0, campos=None):
+        """Histórico de um colaborador, filtrado por data (AAAA-MM-DD). Devolve (registos, total no intervalo).
+        Só as linhas da janela pedida são lidas do log."""
+        with self._lock_indice_historico:
+            self._atualizar_indice_historico()
+            entradas = [(r.get('data'), r) for r in self._historico_legado_por_nome().get(nome_completo, [])]
+            entradas += self._indice_historico.get(nome_completo, [])
+        janela, total = _filtrar_historico(entradas, de, ate, limite, deslocamento)
+        registros = []
+        if any(isinstance(ref, int) for _, ref in janela):
+            with open(self.arquivos_json['historico_log'], 'rb') as f:
+                for _, ref in janela:
+                    if isinstance(ref, int):
+                        f.seek(ref)
+                        registro = json.loads(f.readline())
+                        registro.pop('nome_completo', None)
+                        registros.append(registro)
+                    else:
+                        registros.append(dict(ref))
+        else:
+            registros = [dict(ref) for _, ref in janela]
+        return _projetar(registros, campos), total
+
+    def carregar_historico(self, nome_completo):
+        return self.consultar_historico(nome_completo)[0]
+
+    def ler_historico_desde(self, cursor=None):
+        """
+        Entradas do histórico acrescentadas depois do cursor: devolve ([(nome, registo)], novo cursor, reiniciar).
+        Com reiniciar=True (primeira leitura, log substituído ou histórico antigo alterado) vem o histórico
+        completo e quem agrega deve descartar o que já tinha.
+        """
+        try:
+            st = os.stat(self.arquivos_json['historico'])
+            assinatura_legado = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            assinatura_legado = None
+        arquivo = self.arquivos_json['historico_log']
+        try:
+            st = os.stat(arquivo)
+            ficheiro, tamanho = (st.st_dev, st.st_ino), st.st_size
+        except FileNotFoundError:
+            ficheiro, tamanho = None, 0
+        reiniciar = cursor is None or cursor[0] != assinatura_legado or cursor[1] != ficheiro or tamanho < cursor[2]
+        registros = []
+        if reiniciar:
+            with self._lock_indice_historico:
+                legado = self._historico_legado_por_nome()
+            registros = [(nome, dict(r)) for nome, entradas in legado.items() for r in entradas]
+            posicao = 0
+        else:
+            posicao = cursor[2]
+        if ficheiro is not None and tamanho > posicao:
+            with open(arquivo, 'rb') as f:
+                f.seek(posicao)
+                for linha in f:
+                    if not linha.endswith(b'\n'): break  # escrita ainda em curso
+                    posicao += len(linha)
+                    try:
+                        registro = json.loads(linha)
+                        registros.append((registro.pop('nome_completo'), registro))
+                    except (json.JSONDecodeError, KeyError):
+                        pass
+        return registros, (assinatura_legado, ficheiro, posicao), reiniciar
+
+    def anexar_historico(self, nome_completo, registro):
+        self.anexar_historico_lote([(nome_completo, registro)])
+
+    def anexar_historico_lote(self, registros):
+        """Acrescenta uma linha por (nome_completo, registo) numa única escrita."""
+        linhas = ''.join(json.dumps({'nome_completo': nome_completo, **registro}, ensure_ascii=False) + '\n' for nome_completo, registro in registros)
+        arquivo = self.arquivos_json['historico_log']
+        with bloqueio_arquivo(arquivo), open(arquivo, 'a', encoding='utf-8') as f:
+            f.write(linhas)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# --- IMPLEMENTAÇÃO EM SQLITE ---
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT);
+CREATE TABLE IF NOT EXISTS colaboradores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome_completo TEXT NOT NULL UNIQUE,
+    processo TEXT,
+    turno TEXT,
+    cargo TEXT,
+    dados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_colaboradores_setor_turno ON colaboradores (processo, turno);
+CREATE TABLE IF NOT EXISTS avaliacoes (nome_completo TEXT PRIMARY KEY, sub_atributos TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS historico (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome_completo TEXT NOT NULL,
+    data TEXT,
+    overall INTEGER,
+    registro TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_historico_nome_data ON historico (nome_completo, data);
+CREATE TABLE IF NOT EXISTS pdi (
+    nome_completo TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    prazo TEXT,
+    status TEXT,
+    acao TEXT NOT NULL,
+    PRIMARY KEY (nome_completo, posicao)
+);
+CREATE INDEX IF NOT EXISTS idx_pdi_prazo ON pdi (prazo);
+CREATE TABLE IF NOT EXISTS insignias (
+    nome_completo TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    insignia TEXT NOT NULL,
+    PRIMARY KEY (nome_completo, posicao)
+);
+CREATE TABLE IF NOT EXISTS mudancas_setor (nome_completo TEXT PRIMARY KEY, dados TEXT NOT NULL);
+"""
+
+# Colunas da planilha promovidas a colunas próprias (indexadas) na tabela colaboradores.
+COLUNAS_INDEXADAS = {'Nome_completo': 'nome_completo', 'Processo': 'processo', 'Turno': 'turno', 'Cargo': 'cargo'}
+
+
+class ArmazenamentoSQLite:
+    tipo = 'sqlite'
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        with self._transacao() as conn:
+            conn.executescript(ESQUEMA_SQLITE)
+            conn.execute("INSERT OR IGNORE INTO meta (chave, valor) VALUES ('versao', '0')")
+
+    def _conexao(self):
+        # Uma ligação herdada num fork (gunicorn --preload) não pode ser usada pelo processo filho
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.caminho, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _transacao(self):
+        # "with conn:" faz commit no fim ou rollback em caso de exceção.
+        return self._conexao()
+
+    def _incrementar_versao(self, conn):
+        conn.execute("UPDATE meta SET valor = CAST(valor AS INTEGER) + 1 WHERE chave = 'versao'")
+        conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('modificado_em', ?)", (repr(time.time()),))
+
+    def assinatura(self):
+        linha = self._conexao().execute("SELECT valor FROM meta WHERE chave = 'versao'").fetchone()
+        return (self.caminho, int(linha[0]) if linha else 0)
+
+    def versao_dados(self, com_historico=False, com_mudancas_setor=False):
+        # Todas as escritas, incluindo o histórico e as mudanças de setor, passam pelo mesmo contador de versão
+        meta = dict(self._conexao().execute("SELECT chave, valor FROM meta WHERE chave IN ('versao', 'modificado_em')").fetchall())
+        return (self.caminho, int(meta.get('versao', 0))), float(meta.get('modificado_em', 0))
+
+    # Colaboradores
+    def ler_colaboradores(self):
+        linhas = self._conexao().execute('SELECT id, dados FROM colaboradores ORDER BY id').fetchall()
+        return pd.DataFrame([{COLUNA_ID: id_colaborador, **json.loads(dados)} for id_colaborador, dados in linhas])
+
+    def _gravar_linha_colaborador(self, conn, registro):
+        # O ID vive na coluna 'id' da tabela; num UPSERT o ID existente é mantido.
+        registro = {k: _valor_serializavel(v) for k, v in registro.items()}
+        id_colaborador = registro.pop(COLUNA_ID, None)
+        colunas = {coluna: registro.get(campo) for campo, coluna in COLUNAS_INDEXADAS.items()}
+        conn.execute(
+            """INSERT INTO colaboradores (id, nome_completo, processo, turno, cargo, dados) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (nome_completo) DO UPDATE SET processo = excluded.processo, turno = excluded.turno,
+               cargo = excluded.cargo, dados = excluded.dados""",
+            (id_colaborador, colunas['nome_completo'], colunas['processo'], colunas['turno'], colunas['cargo'], json.dumps(registro, ensure_ascii=False))
+        )
+
+    def gravar_colaboradores(self, df):
+        with self._transacao() as conn:
+            conn.execute('DELETE FROM colaboradores')
+            for registro in df.to_dict('records'):
+                if isinstance(registro.get('Nome_completo'), str) and registro['Nome_completo'].strip():
+                    self._gravar_linha_colaborador(conn, registro)
+            self._incrementar_versao(conn)
+
+    def salvar_colaborador(self, nome_completo, campos):
+        with self._transacao() as conn:
+            linha = conn.execute('SELECT dados FROM colaboradores WHERE nome_completo = ?', (nome_completo,)).fetchone()
+            registro = json.loads(linha[0]) if linha else {'Nome_completo': nome_completo}
+            registro.update(campos)
+            self._gravar_linha_colaborador(conn, registro)
+            self._incrementar_versao(conn)
+
+    # Coleções
+    def carregar(self, colecao):
+        conn = self._conexao()
+        if colecao == 'avaliacoes':
+            return {nome: json.loads(notas) for nome, notas in conn.execute('SELECT nome_completo, sub_atributos FROM avaliacoes')}
+        if colecao == 'mudancas_setor':
+            return {nome: json.loads(dados) for nome, dados in conn.execute('SELECT nome_completo, dados FROM mudancas_setor')}
+        resultado = {}
+        if colecao == 'historico':
+            for nome, registro in conn.execute('SELECT nome_completo, registro FROM historico ORDER BY id'):
+                resultado.setdefault(nome, []).append(json.loads(registro))
+        elif colecao == 'pdi':
+            for nome, acao in conn.execute('SELECT nome_completo, acao FROM pdi ORDER BY nome_completo, posicao'):
+                resultado.setdefault(nome, []).append(json.loads(acao))
+        elif colecao == 'insignias':
+            for nome, insignia in conn.execute('SELECT nome_completo, insignia FROM insignias ORDER BY nome_completo, posicao'):
+                resultado.setdefault(nome, []).append(insignia)
+        else:
+            raise KeyError(colecao)
+        return resultado
+
+    def carregar_item(self, colecao, nome_completo, padrao=None):
+        conn = self._conexao()
+        if colecao == 'avaliacoes':
+            linha = conn.execute('SELECT sub_atributos FROM avaliacoes WHERE nome_completo = ?', (nome_completo,)).fetchone()
+            return json.loads(linha[0]) if linha else padrao
+        if colecao == 'mudancas_setor':
+            linha = conn.execute('SELECT dados FROM mudancas_setor WHERE nome_completo = ?', (nome_completo,)).fetchone()
+            return json.loads(linha[0]) if linha else padrao
+        if colecao == 'historico':
+            linhas = conn.execute('SELECT registro FROM historico WHERE nome_completo = ? ORDER BY id', (nome_completo,)).fetchall()
+        elif colecao == 'pdi':
+            linhas = conn.execute('SELECT acao FROM pdi WHERE nome_completo = ? ORDER BY posicao', (nome_completo,)).fetchall()
+        elif colecao == 'insignias':
+            linhas = conn.execute('SELECT insignia FROM insignias WHERE nome_completo = ? ORDER BY posicao', (nome_completo,)).fetchall()
+            return [insignia for (insignia,) in linhas] if linhas else padrao
+        else:
+            raise KeyError(colecao)
+        return [json.loads(valor) for (valor,) in linhas] if linhas else padrao
+
+    def _salvar_item(self, conn, colecao, nome_completo, valor):
+        if colecao == 'avaliacoes':
+            conn.execute('INSERT OR REPLACE INTO avaliacoes (nome_completo, sub_atributos) VALUES (?, ?)', (nome_completo, json.dumps(valor, ensure_ascii=False)))
+        elif colecao == 'mudancas_setor':
+            conn.execute('INSERT OR REPLACE INTO mudancas_setor (nome_completo, dados) VALUES (?, ?)', (nome_completo, json.dumps(valor, ensure_ascii=False)))
+        elif colecao == 'historico':
+            conn.execute('DELETE FROM historico WHERE nome_completo = ?', (nome_completo,))
+            for registro in valor:
+                self._anexar_historico(conn, nome_completo, registro)
+        elif colecao == 'pdi':
+            conn.execute('DELETE FROM pdi WHERE nome_completo = ?', (nome_completo,))
+            conn.executemany(
+                'INSERT INTO pdi (nome_completo, posicao, prazo, status, acao) VALUES (?, ?, ?, ?, ?)',
+                [(nome_completo, i, acao.get('prazo'), acao.get('status'), json.dumps(acao, ensure_ascii=False)) for i, acao in enumerate(valor)]
+            )
+        elif colecao == 'insignias':
+            conn.execute('DELETE FROM insignias WHERE nome_completo = ?', (nome_completo,))
+            conn.executemany('INSERT INTO insignias (nome_completo, posicao, insignia) VALUES (?, ?, ?)', [(nome_completo, i, insignia) for i, insignia in enumerate(valor)])
+        else:
+            raise KeyError(colecao)
+
+    def salvar_item(self, colecao, nome_completo, valor):
+        self.salvar_itens(colecao, {nome_completo: valor})
+
+    def salvar_itens(self, colecao, itens):
+        with self._transacao() as conn:
+            for nome_completo, valor in itens.items():
+                self._salvar_item(conn, colecao, nome_completo, valor)
+            self._incrementar_versao(conn)
+
+    def atualizar_item(self, colecao, nome_completo, atualizar, padrao=None):
+        conn = self._transacao()
+        with conn:
+            # BEGIN IMMEDIATE reserva a escrita já na leitura: outra ligação espera em vez de gravar por cima
+            conn.execute('BEGIN IMMEDIATE')
+            valor = atualizar(self.carregar_item(colecao, nome_completo, padrao))
+            if valor is SEM_ALTERACAO: return valor
+            self._salvar_item(conn, colecao, nome_completo, valor)
+            self._incrementar_versao(conn)
+        return valor
+
+    def _anexar_historico(self, conn, nome_completo, registro):
+        conn.execute(
+            'INSERT INTO historico (nome_completo, data, overall, registro) VALUES (?, ?, ?, ?)',
+            (nome_completo, registro.get('data'), registro.get('overall'), json.dumps(registro, ensure_ascii=False))
+        )
+
+    def consultar_historico(self, nome_completo, de=None, ate=None, limite=None, deslocamento=0, campos=None):
+        filtros, parametros = ['nome_completo = ?'], [nome_completo]
+        if de: filtros.append('data >= ?'); parametros.append(de)
+        if ate: filtros.append('data <= ?'); parametros.append(ate)
+        where = ' AND '.join(filtros)
+        conn = self._conexao()
+        total = conn.execute(f'SELECT COUNT(*) FROM historico WHERE {where}', parametros).fetchone()[0]
+        linhas = conn.execute(
+            f'SELECT registro FROM historico WHERE {where} ORDER BY id DESC LIMIT ? OFFSET ?',
+            parametros + [-1 if limite is None else limite, deslocamento or 0]
+        ).fetchall()
+        registros = [json.loads(registro) for (registro,) in reversed(linhas)]
+        return _projetar(registros, campos), total
+
+    def carregar_historico(self, nome_completo):
+        return self.consultar_historico(nome_completo)[0]
+
+    def ler_historico_desde(self, cursor=None):
+        # Cursor = (primeiro id, último id lido). O histórico só recebe acréscimos, por isso o primeiro
+        # id só muda quando a tabela é refeita (ex.: importar_de) e aí tudo é lido de novo.
+        conn = self._conexao()
+        primeiro, ultimo = conn.execute('SELECT MIN(id), COALESCE(MAX(id), 0) FROM historico').fetchone()
+        reiniciar = cursor is None or cursor[0] != primeiro or cursor[1] > ultimo
+        desde = 0 if reiniciar else cursor[1]
+        linhas = conn.execute('SELECT id, nome_completo, registro FROM historico WHERE id > ? ORDER BY id', (desde,)).fetchall()
+        registros = [(nome_completo, json.loads(registro)) for _, nome_completo, registro in linhas]
+        return registros, (primeiro, linhas[-1][0] if linhas else desde), reiniciar
+
+    def anexar_historico(self, nome_completo, registro):
+        self.anexar_historico_lote([(nome_completo, registro)])
+
+    def anexar_historico_lote(self, registros):
+        with self._transacao() as conn:
+            for nome_completo, registro in registros:
+                self._anexar_historico(conn, nome_completo, registro)
+            self._incrementar_versao(conn)
+
+    # Importação / exportação
+    def importar_de(self, origem):
+        """Substitui o conteúdo da base pelos dados de outro armazenamento (ex.: os ficheiros atuais)."""
+        df = origem.ler_colaboradores()
+        with self._transacao() as conn:
+            for tabela in ('colaboradores', 'avaliacoes', 'historico', 'pdi', 'insignias', 'mudancas_setor'):
+                conn.execute(f'DELETE FROM {tabela}')
+            for registro in df.to_dict('records'):
+                if isinstance(registro.get('Nome_completo'), str) and registro['Nome_completo'].strip():
+                    self._gravar_linha_colaborador(conn, registro)
+            contagens = {'colaboradores': conn.execute('SELECT COUNT(*) FROM colaboradores').fetchone()[0]}
+            for colecao in COLECOES:
+                dados = origem.carregar(colecao)
+                for nome_completo, valor in dados.items():
+                    self._salvar_item(conn, colecao, nome_completo, valor)
+                contagens[colecao] = len(dados)
+            self._incrementar_versao(conn)
+        return contagens
+
+    def exportar_xlsx(self, destino):
+        self.ler_colaboradores().to_excel(destino, index=False)
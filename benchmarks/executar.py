@@ -0,0 +1,211 @@
+# benchmarks/executar.py
+"""
+Mede o tempo de todas as rotas (pelo test client do Flask) e das funções principais
+(get_dados_completos, calcular_overall_*) sobre um conjunto de dados sintéticos.
+
+    python benchmarks/executar.py --pasta /tmp/carometro_10k --gerar 10000 --historico 50 --saida antes.json
+    # ... alterações ...
+    python benchmarks/executar.py --pasta /tmp/carometro_10k --gerar 10000 --historico 50 --saida depois.json --comparar antes.json
+
+Os resultados (em ms) vão para um JSON com a versão do código e o tamanho dos dados, para
+poderem ser comparados entre execuções. As rotas POST alteram os dados da pasta de benchmark;
+use --gerar para partir sempre do mesmo estado. Com --arranque mede-se também o tempo até ao
+primeiro pedido de um processo novo (importação + criar_app() + primeiro GET /).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from flask import url_for
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from gerar_dados import PASTA_RAIZ, gerar, importar_app
+
+
+def _versao_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PASTA_RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _resumir(tempos):
+    tempos_ms = sorted(t * 1000 for t in tempos)
+    p95 = tempos_ms[min(len(tempos_ms) - 1, int(round(0.95 * (len(tempos_ms) - 1))))]
+    return {
+        'repeticoes': len(tempos_ms), 'min_ms': round(tempos_ms[0], 3), 'mediana_ms': round(statistics.median(tempos_ms), 3),
+        'media_ms': round(statistics.fmean(tempos_ms), 3), 'p95_ms': round(p95, 3), 'max_ms': round(tempos_ms[-1], 3),
+    }
+
+def medir(funcao, repeticoes, aquecer=True, preparar=None):
+    if aquecer: funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar: preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return _resumir(tempos)
+
+def _pedido(cliente, metodo, url, corpo=None):
+    def executar():
+        resposta = cliente.open(url, method=metodo, json=corpo)
+        resposta.get_data()
+        resposta.close()
+        if resposta.status_code >= 400:
+            raise RuntimeError(f"{metodo} {url} respondeu {resposta.status_code}")
+    return executar
+
+def casos_de_teste(app, cliente, frio):
+    """Lista de (nome, função, preparar) a medir."""
+    roster = app.get_roster()
+    if not roster.colaboradores: sys.exit("!!! O roster está vazio; gere dados com --gerar.")
+    aleatorio = random.Random(0)
+    exemplo = roster.colaboradores[0]
+    valores = {
+        'nome_setor': exemplo['Processo'], 'num_turno': exemplo['Turno_Num'] or 1,
+        'colaborador_id': exemplo['id'], 'nome_completo': exemplo['Nome_completo'],
+    }
+    invalidar = app.invalidar_cache_roster if frio else None
+    casos = [
+        ('funcao get_dados_completos (cache frio)', app.get_dados_completos, app.invalidar_cache_roster),
+        ('funcao get_dados_completos (cache quente)', app.get_dados_completos, None),
+    ]
+
+    avaliacoes = app.armazenamento.carregar('avaliacoes')
+    amostra = aleatorio.sample(roster.colaboradores, min(1000, len(roster.colaboradores)))
+    notas_amostra = [(avaliacoes.get(c['Nome_completo'], {}), c.get('Processo')) for c in amostra]
+    casos.append((f'funcao calcular_overall_com_notas x{len(amostra)}', lambda: [app.calcular_overall_com_notas(n, p) for n, p in notas_amostra], None))
+    casos.append((f'funcao calcular_overall_individual x{len(amostra)}', lambda: [app.calcular_overall_individual(c, app.PESOS) for c in amostra], None))
+
+    # Parâmetros de consulta obrigatórios de algumas rotas
+    consultas = {'overall_lote_api': {'ids': ','.join(str(c['id']) for c in amostra)}}
+    for regra in sorted(app.app.url_map.iter_rules(), key=lambda r: r.rule):
+        if regra.endpoint == 'static' or 'GET' not in regra.methods: continue
+        if not regra.arguments <= set(valores):
+            print(f"  (rota ignorada, sem valores de exemplo: {regra.rule})")
+            continue
+        with app.app.test_request_context():
+            url = url_for(regra.endpoint, **{arg: valores[arg] for arg in regra.arguments}, **consultas.get(regra.endpoint, {}))
+        casos.append((f'GET {regra.rule}', _pedido(cliente, 'GET', url), invalidar))
+
+    ids = [c['id'] for c in amostra[:4]]  # o comparador aceita de 2 a 4
+    sub_atributos = app.motor_pontuacao.sub_atributos
+    lote = [{'nome_completo': c['Nome_completo'], 'processo': c.get('Processo'), 'sub_atributos': {sub: aleatorio.randint(30, 99) for sub in sub_atributos}} for c in amostra[:50]]
+    casos += [
+        ('POST /api/comparar', _pedido(cliente, 'POST', '/api/comparar', {'ids': ids}), invalidar),
+        ('POST /api/salvar_avaliacao', _pedido(cliente, 'POST', '/api/salvar_avaliacao', {
+            'nome_completo': exemplo['Nome_completo'], 'processo': exemplo.get('Processo'), 'sub_atributos': {sub: aleatorio.randint(30, 99) for sub in sub_atributos}
+        }), invalidar),
+        (f'POST /api/salvar_avaliacoes_lote x{len(lote)}', _pedido(cliente, 'POST', '/api/salvar_avaliacoes_lote', {'avaliacoes': lote}), invalidar),
+    ]
+    return casos
+
+# Corre num processo novo: importa o app, opcionalmente aquece os caches e faz o primeiro pedido
+_SCRIPT_ARRANQUE = """
+import json, os, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import app
+importado = time.perf_counter()
+app.criar_app(aquecer=sys.argv[2] == '1')
+pronto = time.perf_counter()
+resposta = app.app.test_client().get('/')
+fim = time.perf_counter()
+print(json.dumps({'importacao': importado - inicio, 'criar_app': pronto - importado, 'primeiro_pedido': fim - pronto,
+                  'total': fim - inicio, 'status': resposta.status_code}))
+"""
+
+def medir_arranque(pasta, repeticoes):
+    """Tempo até ao primeiro pedido de um processo novo, com e sem aquecimento no criar_app()."""
+    ambiente = dict(os.environ, CAROMETRO_UPLOADER='local')
+    casos = {}
+    for aquecer in ('0', '1'):
+        medicoes = []
+        for _ in range(repeticoes):
+            saida = subprocess.run([sys.executable, '-c', _SCRIPT_ARRANQUE, PASTA_RAIZ, aquecer], cwd=pasta, env=ambiente, capture_output=True, text=True, check=True).stdout
+            medicoes.append(json.loads(saida.strip().splitlines()[-1]))
+        sufixo = 'com aquecimento' if aquecer == '1' else 'sem aquecimento'
+        for etapa in ('importacao', 'criar_app', 'primeiro_pedido', 'total'):
+            casos[f'arranque {etapa} ({sufixo})'] = _resumir([m[etapa] for m in medicoes])
+    return casos
+
+def comparar(resultados, arquivo_anterior, limiar):
+    with open(arquivo_anterior, 'r', encoding='utf-8') as f: anterior = json.load(f)
+    print(f"\nComparação com '{arquivo_anterior}' (commit {anterior.get('commit')}), pela mediana:")
+    regressoes = 0
+    for nome, atual in resultados.items():
+        antes = anterior['resultados'].get(nome)
+        if not antes or 'erro' in antes or 'erro' in atual: continue
+        variacao = (atual['mediana_ms'] - antes['mediana_ms']) / antes['mediana_ms'] if antes['mediana_ms'] else 0.0
+        marca = ''
+        if variacao > limiar: marca, regressoes = '  <-- REGRESSÃO', regressoes + 1
+        elif variacao < -limiar: marca = '  (melhoria)'
+        print(f"  {nome:<60} {antes['mediana_ms']:>10.2f} -> {atual['mediana_ms']:>10.2f} ms ({variacao:+.1%}){marca}")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das rotas e funções do Carômetro sobre dados sintéticos.")
+    parser.add_argument('--pasta', required=True, help="Pasta com os dados sintéticos (ver gerar_dados.py)")
+    parser.add_argument('--gerar', type=int, metavar='N', help="Gera N colaboradores na pasta antes de medir")
+    parser.add_argument('--historico', type=int, default=10, help="Com --gerar: entradas de histórico por colaborador")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--frio', action='store_true', help="Invalida o cache do roster antes de cada pedido")
+    parser.add_argument('--filtro', help="Mede apenas os casos cujo nome contém este texto")
+    parser.add_argument('--arranque', action='store_true', help="Mede também o tempo até ao primeiro pedido de um processo novo")
+    parser.add_argument('--saida', default='resultados_benchmark.json', help="Ficheiro JSON com os resultados")
+    parser.add_argument('--comparar', metavar='JSON', help="Resultados anteriores para comparar")
+    parser.add_argument('--limiar', type=float, default=0.10, help="Variação a partir da qual se assinala regressão (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    pasta = os.path.abspath(args.pasta)
+    if pasta == PASTA_RAIZ: sys.exit("!!! Use uma pasta de dados à parte, não a pasta do projeto.")
+    saida = os.path.abspath(args.saida)
+    anterior = os.path.abspath(args.comparar) if args.comparar else None
+    resumo_dados = None
+    if args.gerar:
+        print(f"A gerar {args.gerar} colaboradores em '{pasta}'...")
+        inicio = time.perf_counter()
+        resumo_dados = gerar(pasta, args.gerar, args.historico)
+        print(f"  [OK] {resumo_dados} ({time.perf_counter() - inicio:.1f}s)")
+    app = importar_app(pasta)
+    app.app.config['TESTING'] = True
+    cliente = app.app.test_client()
+
+    resultados = {}
+    if args.arranque:
+        for nome, r in medir_arranque(pasta, args.repeticoes).items():
+            if args.filtro and args.filtro not in nome: continue
+            resultados[nome] = r
+            print(f"  {nome:<60} mediana {r['mediana_ms']:>10.2f} ms   p95 {r['p95_ms']:>10.2f} ms")
+    for nome, funcao, preparar in casos_de_teste(app, cliente, args.frio):
+        if args.filtro and args.filtro not in nome: continue
+        try:
+            resultados[nome] = medir(funcao, args.repeticoes, aquecer=preparar is None, preparar=preparar)
+            r = resultados[nome]
+            print(f"  {nome:<60} mediana {r['mediana_ms']:>10.2f} ms   p95 {r['p95_ms']:>10.2f} ms")
+        except Exception as e:
+            resultados[nome] = {'erro': str(e)}
+            print(f"  {nome:<60} !!! ERRO: {e}")
+
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'), 'commit': _versao_codigo(),
+        'python': platform.python_version(), 'plataforma': platform.platform(),
+        'armazenamento': app.armazenamento.tipo, 'colaboradores_no_roster': len(app.get_roster().colaboradores),
+        'dados': resumo_dados, 'repeticoes': args.repeticoes, 'cache_frio': args.frio, 'resultados': resultados,
+    }
+    with open(saida, 'w', encoding='utf-8') as f: json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    print(f"\nResultados gravados em '{saida}'.")
+
+    app.fila_uploads.aguardar()
+    if anterior and comparar(resultados, anterior, args.limiar):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
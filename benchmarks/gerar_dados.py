@@ -0,0 +1,147 @@
+# benchmarks/gerar_dados.py
+"""
+Gera dados sintéticos do Carômetro numa pasta à parte, para medir o desempenho com
+rosters grandes sem tocar nos dados reais:
+
+    python benchmarks/gerar_dados.py --pasta /tmp/carometro_10k --colaboradores 10000 --historico 50
+
+Cria Colaboradores.xlsx, avaliacoes.json, historico_avaliacoes.json, pdi_colaboradores.json
+e insignias_colaboradores.json no mesmo formato usado pela aplicação. Com a mesma --semente
+os ficheiros gerados são sempre iguais.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+
+PASTA_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --- CONFIGURAÇÕES ---
+PRIMEIROS_NOMES = [
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela', 'João',
+    'Karina', 'Lucas', 'Mariana', 'Nicolas', 'Otávio', 'Patrícia', 'Rafael', 'Sabrina', 'Thiago', 'Úrsula',
+    'Vitória', 'Wagner', 'Yasmin', 'Júlia', 'Matheus', 'Letícia', 'Gustavo', 'Camila', 'Rodrigo', 'Beatriz',
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+    'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa',
+    'Rocha', 'Dias', 'Nascimento', 'Andrade', 'Moreira', 'Nunes', 'Marques', 'Machado', 'Mendes', 'Freitas',
+    'Cardoso', 'Ramos', 'Gonçalves', 'Santana', 'Teixeira', 'Moura', 'Correia', 'Pinto', 'Araújo', 'Conceição',
+]
+SETORES = ['Picking', 'Checkout', 'Expedicao', 'Loja', 'Reabastecimento', 'Controle de Estoque', 'Recebimento']
+TURNOS = ['1º Turno', '2º Turno', '3º Turno']
+# (cargo, peso) — só Operacional e Op Empilhadeira aparecem no carômetro, como nos dados reais
+CARGOS = [('Operacional', 90), ('Op Empilhadeira', 5), ('Assistente', 3), ('Técnico III - Log', 2)]
+STATUS_PDI = ['A Fazer', 'Em Andamento', 'Concluído']
+
+
+def importar_app(pasta, raiz=PASTA_RAIZ):
+    """Importa o app.py (da pasta "raiz", por omissão este projeto) a trabalhar sobre os ficheiros
+    da pasta indicada (os caminhos do app são relativos)."""
+    os.environ.setdefault('CAROMETRO_UPLOADER', 'local')
+    os.chdir(pasta)
+    if raiz not in sys.path: sys.path.insert(0, raiz)
+    import app
+    return app
+
+def _nomes_unicos(aleatorio, quantidade):
+    nomes, vistos = [], set()
+    while len(nomes) < quantidade:
+        partes = [aleatorio.choice(PRIMEIROS_NOMES)] + aleatorio.sample(SOBRENOMES, aleatorio.randint(2, 3))
+        nome = ' '.join(partes)
+        if nome in vistos: continue
+        vistos.add(nome)
+        nomes.append(nome)
+    return nomes
+
+def _escrever_json(arquivo, dados):
+    with open(arquivo, 'w', encoding='utf-8') as f: json.dump(dados, f, ensure_ascii=False)
+
+def _escrever_historico(arquivo, aleatorio, nomes, entradas_por_colaborador, sub_atributos, hoje):
+    # Escrito colaborador a colaborador para não montar o histórico inteiro em memória
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        f.write('{')
+        for i, nome in enumerate(nomes):
+            entradas = []
+            for k in range(entradas_por_colaborador, 0, -1):
+                notas = {sub: aleatorio.randint(30, 99) for sub in sub_atributos}
+                entradas.append({
+                    'data': (hoje - timedelta(days=7 * k)).isoformat(),
+                    'overall': round(sum(notas.values()) / len(notas)),
+                    'sub_atributos': notas,
+                })
+            f.write((',' if i else '') + json.dumps(nome, ensure_ascii=False) + ':' + json.dumps(entradas, ensure_ascii=False))
+        f.write('}')
+
+def gerar(pasta, colaboradores=1000, historico=10, fracao_avaliados=0.8, semente=42):
+    """Gera todos os ficheiros na pasta e devolve um resumo com as quantidades geradas."""
+    os.makedirs(pasta, exist_ok=True)
+    aleatorio = random.Random(semente)
+    app = importar_app(pasta) if 'app' not in sys.modules else sys.modules['app']
+    sub_atributos = [sub for subs in app.ESTRUTURA_ATRIBUTOS.values() for sub in subs]
+    insignias = list(app.INSIGNIAS_DISPONIVEIS)
+    hoje = date.today()
+
+    nomes = _nomes_unicos(aleatorio, colaboradores)
+    cargos, pesos_cargos = zip(*CARGOS)
+    linhas = []
+    for i, nome in enumerate(nomes, start=1):
+        partes = nome.split()
+        processo = 'Desligado' if aleatorio.random() < 0.01 else aleatorio.choice(SETORES)
+        linhas.append({
+            'ID': i, 'Matricula': str(40000 + i), 'Nome_completo': nome,
+            'E-mail': f"{partes[0].lower()}.{partes[-1].lower()}{i}@exemplo.com.br",
+            'Cargo': aleatorio.choices(cargos, weights=pesos_cargos)[0],
+            'Nome_Gestor_Imediato': f"Gestor {i % 50}", 'Email_gestor_imediato': f"gestor{i % 50}@exemplo.com.br",
+            'Nome_Gestor_Indireto': f"Coordenador {i % 10}", 'Email_gestor_indireto': f"coordenador{i % 10}@exemplo.com.br",
+            'Processo': processo, 'Turno': aleatorio.choice(TURNOS), 'Situação': 'EFETIVO', 'Status': 'Ativo',
+            'data_desligamento': None, 'Lider': f"Líder {i % 100}", 'Foto_URL': None,
+        })
+    pd.DataFrame(linhas).to_excel(os.path.join(pasta, app.ARQUIVO_COLABORADORES), index=False)
+
+    avaliados = [nome for nome in nomes if aleatorio.random() < fracao_avaliados]
+    _escrever_json(os.path.join(pasta, app.ARQUIVO_AVALIACOES), {
+        nome: {sub: aleatorio.randint(30, 99) for sub in sub_atributos} for nome in avaliados
+    })
+    _escrever_historico(os.path.join(pasta, app.ARQUIVO_HISTORICO), aleatorio, avaliados, historico, sub_atributos, hoje)
+
+    pdi, id_acao = {}, 0
+    for nome in nomes:
+        acoes = []
+        for _ in range(aleatorio.randint(0, 3)):
+            id_acao += 1
+            acoes.append({
+                'id': id_acao, 'descricao': f"Ação de desenvolvimento {id_acao}",
+                'prazo': (hoje + timedelta(days=aleatorio.randint(-60, 180))).isoformat(), 'status': aleatorio.choice(STATUS_PDI),
+            })
+        if acoes: pdi[nome] = acoes
+    _escrever_json(os.path.join(pasta, app.ARQUIVO_PDI), pdi)
+    _escrever_json(os.path.join(pasta, app.ARQUIVO_INSIGNIAS), {
+        nome: aleatorio.sample(insignias, aleatorio.randint(1, 3)) for nome in nomes if aleatorio.random() < 0.3
+    })
+    # Ficheiros que podem ter ficado de uma geração anterior na mesma pasta
+    for arquivo in (app.ARQUIVO_HISTORICO_LOG, app.ARQUIVO_MUDANCAS_SETOR):
+        caminho = os.path.join(pasta, arquivo)
+        if os.path.exists(caminho): os.remove(caminho)
+
+    return {
+        'colaboradores': colaboradores, 'avaliados': len(avaliados), 'historico_por_avaliado': historico,
+        'entradas_historico': len(avaliados) * historico, 'acoes_pdi': id_acao, 'semente': semente,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos do Carômetro para benchmarks.")
+    parser.add_argument('--pasta', required=True, help="Pasta de destino (não use a pasta do projeto)")
+    parser.add_argument('--colaboradores', type=int, default=1000, help="Número de colaboradores (ex.: 100 a 100000)")
+    parser.add_argument('--historico', type=int, default=10, help="Entradas de histórico por colaborador avaliado")
+    parser.add_argument('--fracao-avaliados', type=float, default=0.8, help="Fração dos colaboradores com avaliação")
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    if os.path.abspath(args.pasta) == PASTA_RAIZ:
+        sys.exit("!!! A pasta de destino não pode ser a pasta do projeto (os dados reais seriam substituídos).")
+    resumo = gerar(os.path.abspath(args.pasta), args.colaboradores, args.historico, args.fracao_avaliados, args.semente)
+    print(f"Dados gerados em '{args.pasta}': {resumo}")
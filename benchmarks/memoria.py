@@ -0,0 +1,85 @@
+# benchmarks/memoria.py
+"""
+Mede a memória do roster com o tracemalloc: o pico e o que fica retido ao montar o snapshot,
+o número de blocos alocados e de objetos seguidos pelo gc, e o pico de alguns pedidos.
+
+    python benchmarks/memoria.py --pasta /tmp/carometro_10k --gerar 10000 --saida memoria_depois.json
+
+Para comparar com outra versão do código, aponte --raiz para uma cópia desse commit
+(ex.: git worktree add /tmp/carometro_antes <commit>) e use os mesmos dados:
+
+    python benchmarks/memoria.py --pasta /tmp/carometro_10k --raiz /tmp/carometro_antes --saida memoria_antes.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from gerar_dados import PASTA_RAIZ, gerar, importar_app
+
+
+def _medir(funcao):
+    """Executa funcao() sob o tracemalloc; devolve (resultado, medições). O resultado fica vivo
+    até ao fim da medição, por isso "retido" é a memória que ele ocupa."""
+    gc.collect()
+    objetos_antes = len(gc.get_objects())
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    retido, pico = tracemalloc.get_traced_memory()
+    blocos = sum(estatistica.count for estatistica in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    gc.collect()
+    return resultado, {
+        'retido_mb': round(retido / 2 ** 20, 2), 'pico_mb': round(pico / 2 ** 20, 2), 'blocos_retidos': blocos,
+        'objetos_gc': len(gc.get_objects()) - objetos_antes, 'tempo_s': round(duracao, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória do roster do Carômetro (tracemalloc) sobre dados sintéticos.")
+    parser.add_argument('--pasta', required=True, help="Pasta com os dados sintéticos (ver gerar_dados.py)")
+    parser.add_argument('--gerar', type=int, metavar='N', help="Gera N colaboradores na pasta antes de medir")
+    parser.add_argument('--historico', type=int, default=10, help="Com --gerar: entradas de histórico por colaborador")
+    parser.add_argument('--raiz', default=PASTA_RAIZ, help="Pasta do código a medir (por omissão, este projeto)")
+    parser.add_argument('--saida', default='resultados_benchmark_memoria.json', help="Ficheiro JSON com os resultados")
+    args = parser.parse_args()
+
+    pasta, raiz, saida = os.path.abspath(args.pasta), os.path.abspath(args.raiz), os.path.abspath(args.saida)
+    if pasta == PASTA_RAIZ: sys.exit("!!! Use uma pasta de dados à parte, não a pasta do projeto.")
+    if args.gerar:
+        print(f"A gerar {args.gerar} colaboradores em '{pasta}'...")
+        gerar(pasta, args.gerar, args.historico)
+    os.environ['CAROMETRO_SNAPSHOT_PARTILHADO'] = '0'
+    app = importar_app(pasta, raiz)
+    app.app.config['TESTING'] = True
+    cliente = app.app.test_client()
+
+    resultados = {}
+    roster, resultados['montar roster'] = _medir(lambda: app.SnapshotRoster(*app._montar_dados_completos()))
+    colaboradores = len(roster.colaboradores)
+    del roster
+    app.get_roster()  # os pedidos abaixo usam o snapshot em cache
+    ids = [c['id'] for c in app.get_roster().colaboradores[:4]]
+    pedidos = {
+        'get_dados_completos': app.get_dados_completos,
+        f'GET /colaborador/{ids[0]}': lambda: cliente.get(f'/colaborador/{ids[0]}').get_data(),
+        'GET /detalhamento': lambda: cliente.get('/detalhamento').get_data(),
+        'POST /api/comparar': lambda: cliente.post('/api/comparar', json={'ids': ids}).get_data(),
+    }
+    for nome, funcao in pedidos.items():
+        funcao()  # aquece caches e templates
+        _, resultados[nome] = _medir(funcao)
+    for nome, r in resultados.items():
+        print(f"  {nome:<30} retido {r['retido_mb']:>8.2f} MB   pico {r['pico_mb']:>8.2f} MB   blocos {r['blocos_retidos']:>9}   objetos gc {r['objetos_gc']:>8}")
+
+    relatorio = {'raiz': raiz, 'colaboradores_no_roster': colaboradores, 'resultados': resultados}
+    with open(saida, 'w', encoding='utf-8') as f: json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    print(f"\nResultados gravados em '{saida}'.")
+
+if __name__ == "__main__":
+    main()
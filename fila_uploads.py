@@ -0,0 +1,151 @@
+# fila_uploads.py
+"""
+Fila de uploads de fotos em segundo plano.
+
+A foto é primeiro guardada numa pasta local e a requisição termina logo; uma thread
+de trabalho faz o upload (Cloudinary ou outro "enviar" qualquer), com novas tentativas
+e espera crescente, e no fim chama "ao_concluir(nome_completo, url)" para preencher a
+Foto_URL. O estado de cada tarefa fica num pequeno ficheiro JSON na mesma pasta, por
+isso pode ser consultado a partir de qualquer worker e as tarefas interrompidas por um
+reinício são retomadas.
+
+Retenção: a foto local é apagada quando a tarefa termina, com sucesso ou não (uma tarefa
+que falhou obriga a enviar a foto de novo). O ficheiro de estado das tarefas terminadas
+fica consultável durante "retencao" segundos (7 dias por omissão) e depois é apagado por
+retomar_pendentes(), que corre no arranque de cada worker.
+"""
+import json
+import os
+import re
+import shutil
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from armazenamento import bloqueio_arquivo, escrever_atomico
+
+
+class EnvioLocal:
+    """Substituto do Cloudinary que copia a foto para uma pasta servida pela aplicação.
+    Útil para desenvolvimento e testes sem rede."""
+    def __init__(self, pasta_destino, url_base):
+        self.pasta_destino = pasta_destino
+        self.url_base = url_base.rstrip('/')
+
+    def __call__(self, caminho, public_id):
+        os.makedirs(self.pasta_destino, exist_ok=True)
+        nome_ficheiro = public_id + os.path.splitext(caminho)[1].lower()
+        shutil.copyfile(caminho, os.path.join(self.pasta_destino, nome_ficheiro))
+        return f"{self.url_base}/{nome_ficheiro}"
+
+
+class FilaUploads:
+    ESTADOS_FINAIS = ('concluido', 'falhou')
+
+    def __init__(self, pasta, enviar, ao_concluir, trabalhadores=2, max_tentativas=3, espera_base=2.0, prazo_retomada=300, retencao=7 * 24 * 3600):
+        self.pasta = pasta
+        self.enviar = enviar
+        self.ao_concluir = ao_concluir
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.prazo_retomada = prazo_retomada
+        self.retencao = retencao
+        os.makedirs(pasta, exist_ok=True)
+        # As threads só são criadas no primeiro submit, por isso é seguro criar a fila antes do fork do gunicorn
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='upload-foto')
+
+    def _caminho_tarefa(self, id_tarefa):
+        return os.path.join(self.pasta, f'{id_tarefa}.json')
+
+    def _gravar(self, tarefa):
+        tarefa['atualizado_em'] = time.time()
+        conteudo = json.dumps(tarefa, ensure_ascii=False).encode('utf-8')
+        escrever_atomico(self._caminho_tarefa(tarefa['id']), lambda f: f.write(conteudo))
+
+    def estado(self, id_tarefa):
+        if not re.fullmatch(r'[0-9a-f]{32}', id_tarefa or ''):
+            return None
+        try:
+            with open(self._caminho_tarefa(id_tarefa), 'r', encoding='utf-8') as f: return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError): return None
+
+    def enfileirar(self, foto, nome_completo, public_id):
+        """Guarda a foto (FileStorage do Flask ou caminho) localmente e agenda o upload. Devolve o id da tarefa."""
+        id_tarefa = uuid.uuid4().hex
+        extensao = os.path.splitext(getattr(foto, 'filename', None) or str(foto))[1].lower()
+        caminho_local = os.path.join(self.pasta, id_tarefa + extensao)
+        if hasattr(foto, 'save'): foto.save(caminho_local)
+        else: shutil.copyfile(foto, caminho_local)
+        tarefa = {
+            'id': id_tarefa, 'nome_completo': nome_completo, 'public_id': public_id, 'arquivo': caminho_local,
+            'estado': 'pendente', 'tentativas': 0, 'erro': None, 'foto_url': None, 'criado_em': time.time()
+        }
+        self._gravar(tarefa)
+        self._executor.submit(self._processar, tarefa)
+        return id_tarefa
+
+    def _processar(self, tarefa):
+        while tarefa['tentativas'] < self.max_tentativas:
+            tarefa['tentativas'] += 1
+            tarefa['estado'] = 'enviando'
+            self._gravar(tarefa)
+            try:
+                foto_url = self.enviar(tarefa['arquivo'], tarefa['public_id'])
+                self.ao_concluir(tarefa['nome_completo'], foto_url)
+            except Exception as e:
+                print(f"ERRO NO UPLOAD DA FOTO ({tarefa['nome_completo']}, tentativa {tarefa['tentativas']}): {e}")
+                traceback.print_exc()
+                tarefa['erro'] = str(e)
+                if tarefa['tentativas'] < self.max_tentativas:
+                    tarefa['estado'] = 'pendente'
+                    self._gravar(tarefa)
+                    time.sleep(self.espera_base * 2 ** (tarefa['tentativas'] - 1))
+                continue
+            tarefa.update({'estado': 'concluido', 'foto_url': foto_url, 'erro': None})
+            self._gravar(tarefa)
+            self._apagar_foto(tarefa)
+            return
+        tarefa['estado'] = 'falhou'
+        self._gravar(tarefa)
+        self._apagar_foto(tarefa)
+
+    def _apagar_foto(self, tarefa):
+        if os.path.exists(tarefa['arquivo']): os.remove(tarefa['arquivo'])
+
+    def _apagar_tarefa(self, tarefa):
+        self._apagar_foto(tarefa)
+        caminho = self._caminho_tarefa(tarefa['id'])
+        for arquivo in (caminho, caminho + '.lock'):
+            if os.path.exists(arquivo): os.remove(arquivo)
+
+    def retomar_pendentes(self):
+        """Reagenda as tarefas que ficaram por terminar (ex.: o processo foi reiniciado a meio) e
+        apaga as terminadas há mais de "retencao" segundos."""
+        retomadas, expiradas = 0, []
+        for nome_ficheiro in os.listdir(self.pasta):
+            id_tarefa, extensao = os.path.splitext(nome_ficheiro)
+            if extensao != '.json' or not re.fullmatch(r'[0-9a-f]{32}', id_tarefa): continue
+            caminho = self._caminho_tarefa(id_tarefa)
+            with bloqueio_arquivo(caminho):
+                tarefa = self.estado(id_tarefa)
+                if not tarefa: continue
+                if tarefa['estado'] in self.ESTADOS_FINAIS:
+                    if time.time() - tarefa.get('atualizado_em', 0) > self.retencao: expiradas.append(tarefa)
+                    continue
+                if time.time() - tarefa.get('atualizado_em', 0) < self.prazo_retomada: continue
+                if tarefa['tentativas'] >= self.max_tentativas: tarefa['tentativas'] = self.max_tentativas - 1
+                self._gravar(tarefa)  # marca a tarefa como reclamada por este processo
+            self._executor.submit(self._processar, tarefa)
+            retomadas += 1
+        # Fora do bloqueio, que também usa o ficheiro .lock da tarefa
+        for tarefa in expiradas:
+            try:
+                self._apagar_tarefa(tarefa)
+            except OSError:
+                pass  # outro worker pode estar a apagá-la ao mesmo tempo
+        return retomadas
+
+    def aguardar(self):
+        """Espera que todas as tarefas agendadas terminem (usado em testes e scripts)."""
+        self._executor.shutdown(wait=True)
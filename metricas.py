@@ -0,0 +1,153 @@
+# metricas.py
+"""
+Medição de tempos do Carômetro.
+
+"medir(etapa)" cronometra um bloco de código (leitura do xlsx, JSON, pontuação,
+render, upload...). Cada medição entra num histograma por etapa e, se estiver a
+decorrer um pedido HTTP, também na lista de etapas desse pedido, que a aplicação
+devolve no cabeçalho Server-Timing. Os tempos totais dos pedidos ficam em
+histogramas por rota, exportados no formato de texto do Prometheus.
+
+O custo é um perf_counter e uma soma por medição. CAROMETRO_METRICAS=0 desliga tudo:
+"medir" passa a não fazer nada e a aplicação não regista os hooks.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ATIVO = os.getenv('CAROMETRO_METRICAS', '1').strip().lower() not in ('0', 'false', 'nao', 'não', 'off')
+
+# Limites (em segundos) dos baldes dos histogramas
+LIMITES_HISTOGRAMA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Etapas do pedido em curso: lista de (etapa, duração) ou None fora de um pedido
+_etapas_pedido = contextvars.ContextVar('etapas_pedido', default=None)
+
+
+class Histograma:
+    __slots__ = ('baldes', 'soma', 'contagem')
+
+    def __init__(self):
+        self.baldes = [0] * (len(LIMITES_HISTOGRAMA) + 1)  # o último é o +Inf
+        self.soma = 0.0
+        self.contagem = 0
+
+    def observar(self, valor):
+        self.baldes[bisect.bisect_left(LIMITES_HISTOGRAMA, valor)] += 1
+        self.soma += valor
+        self.contagem += 1
+
+    def linhas_prometheus(self, nome, rotulos):
+        linhas, acumulado = [], 0
+        for limite, quantidade in zip(LIMITES_HISTOGRAMA + (float('inf'),), self.baldes):
+            acumulado += quantidade
+            le = '+Inf' if limite == float('inf') else repr(limite)
+            linhas.append(f'{nome}_bucket{{{_rotulos(rotulos, le=le)}}} {acumulado}')
+        linhas.append(f'{nome}_sum{{{_rotulos(rotulos)}}} {self.soma:.6f}')
+        linhas.append(f'{nome}_count{{{_rotulos(rotulos)}}} {self.contagem}')
+        return linhas
+
+
+def _rotulos(rotulos, **extra):
+    pares = list(rotulos.items()) + list(extra.items())
+    return ','.join('{}="{}"'.format(chave, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for chave, valor in pares)
+
+
+class RegistoMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.duracao_pedidos = {}  # (rota, método) -> Histograma
+        self.total_pedidos = {}    # (rota, método, status) -> contagem
+        self.duracao_etapas = {}   # etapa -> Histograma
+        self.arranque = {}         # etapa do arranque do processo -> segundos
+
+    def observar_pedido(self, rota, metodo, status, duracao):
+        with self._lock:
+            histograma = self.duracao_pedidos.get((rota, metodo))
+            if histograma is None: histograma = self.duracao_pedidos[(rota, metodo)] = Histograma()
+            histograma.observar(duracao)
+            chave = (rota, metodo, status)
+            self.total_pedidos[chave] = self.total_pedidos.get(chave, 0) + 1
+
+    def observar_etapa(self, etapa, duracao):
+        with self._lock:
+            histograma = self.duracao_etapas.get(etapa)
+            if histograma is None: histograma = self.duracao_etapas[etapa] = Histograma()
+            histograma.observar(duracao)
+
+    def registar_arranque(self, etapa, duracao):
+        with self._lock: self.arranque[etapa] = duracao
+
+    def exportar_prometheus(self):
+        with self._lock:
+            linhas = [
+                '# HELP carometro_pedido_duracao_segundos Duração dos pedidos HTTP por rota.',
+                '# TYPE carometro_pedido_duracao_segundos histogram',
+            ]
+            for (rota, metodo), histograma in sorted(self.duracao_pedidos.items()):
+                linhas += histograma.linhas_prometheus('carometro_pedido_duracao_segundos', {'rota': rota, 'metodo': metodo})
+            linhas += [
+                '# HELP carometro_pedidos_total Pedidos HTTP por rota e status.',
+                '# TYPE carometro_pedidos_total counter',
+            ]
+            for (rota, metodo, status), total in sorted(self.total_pedidos.items()):
+                linhas.append(f'carometro_pedidos_total{{{_rotulos({"rota": rota, "metodo": metodo, "status": status})}}} {total}')
+            linhas += [
+                '# HELP carometro_etapa_duracao_segundos Duração das etapas internas (xlsx, JSON, pontuação, render, upload).',
+                '# TYPE carometro_etapa_duracao_segundos histogram',
+            ]
+            for etapa, histograma in sorted(self.duracao_etapas.items()):
+                linhas += histograma.linhas_prometheus('carometro_etapa_duracao_segundos', {'etapa': etapa})
+            linhas += [
+                '# HELP carometro_arranque_segundos Duração do arranque deste processo (importação, aquecimento, primeiro pedido).',
+                '# TYPE carometro_arranque_segundos gauge',
+            ]
+            for etapa, duracao in sorted(self.arranque.items()):
+                linhas.append(f'carometro_arranque_segundos{{{_rotulos({"etapa": etapa})}}} {duracao:.6f}')
+        return '\n'.join(linhas) + '\n'
+
+
+registo = RegistoMetricas()
+
+
+@contextmanager
+def medir(etapa):
+    if not ATIVO:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registar_etapa(etapa, time.perf_counter() - inicio)
+
+def registar_etapa(etapa, duracao):
+    registo.observar_etapa(etapa, duracao)
+    etapas = _etapas_pedido.get()
+    if etapas is not None: etapas.append((etapa, duracao))
+
+def iniciar_pedido():
+    """Começa a recolher as etapas do pedido atual; devolve o token para terminar_pedido."""
+    return _etapas_pedido.set([])
+
+def etapas_do_pedido():
+    return _etapas_pedido.get() or []
+
+def terminar_pedido(token):
+    _etapas_pedido.reset(token)
+
+def cabecalho_server_timing(etapas, duracao_total):
+    """Agrupa as etapas pelo nome (somando as durações) e monta o valor do Server-Timing em ms."""
+    agrupadas = {}
+    for etapa, duracao in etapas:
+        soma, vezes = agrupadas.get(etapa, (0.0, 0))
+        agrupadas[etapa] = (soma + duracao, vezes + 1)
+    partes = [
+        f'{etapa};dur={soma * 1000:.2f}' + (f';desc="{vezes}x"' if vezes > 1 else '')
+        for etapa, (soma, vezes) in agrupadas.items()
+    ]
+    partes.append(f'total;dur={duracao_total * 1000:.2f}')
+    return ', '.join(partes)
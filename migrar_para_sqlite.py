@@ -0,0 +1,42 @@
+import argparse
+from armazenamento import ArmazenamentoArquivos, ArmazenamentoSQLite
+
+# --- CONFIGURAÇÕES ---
+# Os mesmos ficheiros usados pelo app.py no modo "arquivos"
+ARQUIVO_COLABORADORES = 'Colaboradores.xlsx'
+ARQUIVOS_JSON = {
+    'avaliacoes': 'avaliacoes.json',
+    'historico': 'historico_avaliacoes.json',
+    'historico_log': 'historico_avaliacoes.jsonl',
+    'pdi': 'pdi_colaboradores.json',
+    'insignias': 'insignias_colaboradores.json',
+    'mudancas_setor': 'mudancas_setor.json',
+}
+ARQUIVO_SQLITE = 'carometro.db'
+
+def importar(destino):
+    """
+    Copia a planilha e todos os ficheiros JSON para a base SQLite.
+    Depois da importação, arranque a aplicação com CAROMETRO_ARMAZENAMENTO=sqlite.
+    """
+    print(f"A importar '{ARQUIVO_COLABORADORES}' e ficheiros JSON para '{destino}'...")
+    origem = ArmazenamentoArquivos(ARQUIVO_COLABORADORES, ARQUIVOS_JSON)
+    contagens = ArmazenamentoSQLite(destino).importar_de(origem)
+    for tabela, total in contagens.items():
+        print(f"  [OK] {tabela}: {total}")
+    print("\nImportação concluída!")
+
+def exportar(origem, destino_xlsx):
+    """A planilha passa a ser apenas um formato de exportação da base SQLite."""
+    ArmazenamentoSQLite(origem).exportar_xlsx(destino_xlsx)
+    print(f"Base '{origem}' exportada para '{destino_xlsx}'.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa os dados do Carômetro para SQLite (ou exporta de volta para xlsx).")
+    parser.add_argument('--db', default=ARQUIVO_SQLITE, help="Caminho da base SQLite")
+    parser.add_argument('--exportar', metavar='XLSX', help="Exporta a base para uma planilha em vez de importar")
+    args = parser.parse_args()
+    if args.exportar:
+        exportar(args.db, args.exportar)
+    else:
+        importar(args.db)
@@ -1,6 +1,9 @@
 # renomear_fotos.py
+import argparse
+import json
 import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from unidecode import unidecode
 import re
 
@@ -8,7 +11,10 @@ import re
 MODO_TESTE = False # MUDE PARA False PARA RENOMEAR DE VERDADE
 ARQUIVO_EXCEL = 'Colaboradores.xlsx'
 PASTA_FOTOS = os.path.join('static', 'fotos')
+ARQUIVO_RELATORIO = 'relatorio_renomear_fotos.json'
 PALAVRAS_IGNORADAS = ['copia', 'de', 'foto', 'imagem', 'img', 'picking', 'checkout', 'expedicao', 'loja', 'reabastecimento', 'controle', 'estoque', 'recebimento', 'setor']
+# Abaixo disto não compensa arrancar processos: a comparação com o índice já é rápida
+MINIMO_FOTOS_PARALELO = 2000
 
 def limpar_texto(texto):
     texto_limpo = unidecode(texto.lower())
@@ -17,57 +23,131 @@ def limpar_texto(texto):
         texto_limpo = texto_limpo.replace(f' {palavra} ', ' ')
     return texto_limpo.split()
 
-print("Iniciando script inteligente para renomear fotos (v2.0)...")
-try:
-    df = pd.read_excel(ARQUIVO_EXCEL)
-    nomes_oficiais = df['Nome_completo'].dropna().tolist()
-    print(f"Encontrados {len(nomes_oficiais)} nomes na planilha.")
-    fotos_na_pasta = [f for f in os.listdir(PASTA_FOTOS) if os.path.isfile(os.path.join(PASTA_FOTOS, f))]
-    print(f"Encontradas {len(fotos_na_pasta)} fotos na pasta '{PASTA_FOTOS}'.\n")
-except Exception as e:
-    print(f"!!! ERRO ao carregar dados: {e}. Abortando.")
-    exit()
-
-renomeadas, ignoradas = 0, 0
-for nome_antigo_arquivo in fotos_na_pasta:
-    nome_base_arquivo, extensao = os.path.splitext(nome_antigo_arquivo)
+def criar_indice(nomes_oficiais):
+    """
+    Índice invertido: palavra normalizada -> posições (na planilha) dos nomes que a contêm.
+    Cada nome oficial é limpo uma única vez, em vez de uma vez por foto.
+    """
+    indice = {}
+    for posicao, nome_oficial in enumerate(nomes_oficiais):
+        for palavra in set(limpar_texto(nome_oficial)):
+            indice.setdefault(palavra, []).append(posicao)
+    return indice
+
+def classificar_foto(nome_arquivo, nomes_oficiais, indice):
+    """
+    Decide o destino de uma foto. Só são pontuados os nomes que partilham pelo menos uma
+    palavra com o ficheiro; os restantes teriam pontuação 0 e nunca seriam escolhidos.
+    A pontuação é o número de palavras do ficheiro (com repetições) presentes no nome oficial,
+    e em caso de empate o primeiro nome da planilha é o "melhor" e os outros ficam como ambíguos.
+    """
+    nome_base_arquivo, extensao = os.path.splitext(nome_arquivo)
     palavras_chave_arquivo = limpar_texto(nome_base_arquivo)
     if not palavras_chave_arquivo:
-        print(f"❌ Ignorado: '{nome_antigo_arquivo}' não contém palavras-chave úteis.")
-        ignoradas += 1
-        continue
-
-    melhor_match, maior_pontuacao, matches_ambiguos = None, 0, []
-    for nome_oficial in nomes_oficiais:
-        palavras_nome_oficial = limpar_texto(nome_oficial)
-        pontuacao_atual = sum(1 for palavra_chave in palavras_chave_arquivo if palavra_chave in palavras_nome_oficial)
-        if pontuacao_atual > maior_pontuacao:
-            maior_pontuacao, melhor_match, matches_ambiguos = pontuacao_atual, nome_oficial, []
-        elif pontuacao_atual == maior_pontuacao and maior_pontuacao > 0:
-            matches_ambiguos.append(nome_oficial)
-
-    if maior_pontuacao >= 2 and not matches_ambiguos:
-        novo_nome_base = unidecode(melhor_match.lower().replace(' ', '-'))
-        novo_nome_arquivo = f"{novo_nome_base}{extensao}"
-        caminho_antigo, caminho_novo = os.path.join(PASTA_FOTOS, nome_antigo_arquivo), os.path.join(PASTA_FOTOS, novo_nome_arquivo)
-        print(f"✔ Encontrado: '{nome_antigo_arquivo}'  -->  '{novo_nome_arquivo}' (Match: {melhor_match})")
-        if not MODO_TESTE:
-            try:
-                os.rename(caminho_antigo, caminho_novo)
-            except Exception as e:
-                print(f"  └─ !!! ERRO ao renomear: {e}")
-        renomeadas += 1
-    elif matches_ambiguos:
-        print(f"⚠ Ignorado: '{nome_antigo_arquivo}' é ambíguo. Possíveis matches: {[melhor_match] + matches_ambiguos}")
-        ignoradas += 1
-    else:
-        print(f"❌ Ignorado: '{nome_antigo_arquivo}' não teve correspondência forte na planilha.")
-        ignoradas += 1
-
-print("\n--- Concluído! ---")
-if MODO_TESTE:
-    print(">>> MODO DE TESTE ATIVADO. NENHUM ARQUIVO FOI REALMENTE RENOMEADO. <<<")
-print(f"Arquivos que seriam renomeados: {renomeadas}")
-print(f"Arquivos ignorados: {ignoradas}")
-if MODO_TESTE and renomeadas > 0:
-    print("\nSe os resultados estão corretos, mude MODO_TESTE para False e rode o script novamente.")
\ No newline at end of file
+        return {'arquivo': nome_arquivo, 'resultado': 'sem_palavras'}
+
+    pontuacoes = {}
+    for palavra_chave in palavras_chave_arquivo:
+        for posicao in indice.get(palavra_chave, ()):
+            pontuacoes[posicao] = pontuacoes.get(posicao, 0) + 1
+    maior_pontuacao = max(pontuacoes.values(), default=0)
+    if maior_pontuacao == 0:
+        return {'arquivo': nome_arquivo, 'resultado': 'sem_correspondencia', 'pontuacao': 0}
+
+    empatados = sorted(posicao for posicao, pontuacao in pontuacoes.items() if pontuacao == maior_pontuacao)
+    melhor_match = nomes_oficiais[empatados[0]]
+    if len(empatados) > 1:
+        return {'arquivo': nome_arquivo, 'resultado': 'ambiguo', 'pontuacao': maior_pontuacao, 'candidatos': [nomes_oficiais[p] for p in empatados]}
+    if maior_pontuacao < 2:
+        return {'arquivo': nome_arquivo, 'resultado': 'sem_correspondencia', 'pontuacao': maior_pontuacao, 'melhor_candidato': melhor_match}
+    novo_nome_base = unidecode(melhor_match.lower().replace(' ', '-'))
+    return {'arquivo': nome_arquivo, 'resultado': 'encontrado', 'pontuacao': maior_pontuacao, 'match': melhor_match, 'novo_nome': f"{novo_nome_base}{extensao}"}
+
+# Estado de cada processo de trabalho (preenchido uma vez pelo initializer)
+_nomes_trabalhador, _indice_trabalhador = None, None
+
+def _iniciar_trabalhador(nomes_oficiais):
+    global _nomes_trabalhador, _indice_trabalhador
+    _nomes_trabalhador, _indice_trabalhador = nomes_oficiais, criar_indice(nomes_oficiais)
+
+def _classificar_lote(lote):
+    return [classificar_foto(nome_arquivo, _nomes_trabalhador, _indice_trabalhador) for nome_arquivo in lote]
+
+def classificar_fotos(fotos, nomes_oficiais, trabalhadores=None):
+    """Classifica todas as fotos, mantendo a ordem; pastas grandes são divididas por vários processos."""
+    trabalhadores = trabalhadores or os.cpu_count() or 1
+    if trabalhadores <= 1 or len(fotos) < MINIMO_FOTOS_PARALELO:
+        indice = criar_indice(nomes_oficiais)
+        return [classificar_foto(nome_arquivo, nomes_oficiais, indice) for nome_arquivo in fotos]
+    tamanho_lote = max(1, len(fotos) // (trabalhadores * 4))
+    lotes = [fotos[i:i + tamanho_lote] for i in range(0, len(fotos), tamanho_lote)]
+    with ProcessPoolExecutor(max_workers=trabalhadores, initializer=_iniciar_trabalhador, initargs=(nomes_oficiais,)) as executor:
+        return [resultado for resultados_lote in executor.map(_classificar_lote, lotes) for resultado in resultados_lote]
+
+def main():
+    parser = argparse.ArgumentParser(description="Renomeia as fotos da pasta com o nome oficial do colaborador.")
+    parser.add_argument('--pasta', default=PASTA_FOTOS)
+    parser.add_argument('--excel', default=ARQUIVO_EXCEL)
+    parser.add_argument('--relatorio', default=ARQUIVO_RELATORIO, help="Ficheiro JSON com o resultado de cada foto")
+    parser.add_argument('--trabalhadores', type=int, default=None, help="Processos para pastas grandes (padrão: nº de CPUs)")
+    parser.add_argument('--teste', action='store_true', help="Força o MODO_TESTE (não renomeia nada)")
+    args = parser.parse_args()
+    modo_teste = MODO_TESTE or args.teste
+
+    print("Iniciando script inteligente para renomear fotos (v3.0)...")
+    try:
+        df = pd.read_excel(args.excel)
+        nomes_oficiais = df['Nome_completo'].dropna().tolist()
+        print(f"Encontrados {len(nomes_oficiais)} nomes na planilha.")
+        fotos_na_pasta = [f for f in os.listdir(args.pasta) if os.path.isfile(os.path.join(args.pasta, f))]
+        print(f"Encontradas {len(fotos_na_pasta)} fotos na pasta '{args.pasta}'.\n")
+    except Exception as e:
+        print(f"!!! ERRO ao carregar dados: {e}. Abortando.")
+        exit()
+
+    resultados = classificar_fotos(fotos_na_pasta, nomes_oficiais, args.trabalhadores)
+
+    renomeadas, ignoradas = 0, 0
+    for resultado in resultados:
+        nome_antigo_arquivo = resultado['arquivo']
+        if resultado['resultado'] == 'encontrado':
+            novo_nome_arquivo = resultado['novo_nome']
+            caminho_antigo, caminho_novo = os.path.join(args.pasta, nome_antigo_arquivo), os.path.join(args.pasta, novo_nome_arquivo)
+            print(f"✔ Encontrado: '{nome_antigo_arquivo}'  -->  '{novo_nome_arquivo}' (Match: {resultado['match']})")
+            if not modo_teste:
+                try:
+                    os.rename(caminho_antigo, caminho_novo)
+                except Exception as e:
+                    print(f"  └─ !!! ERRO ao renomear: {e}")
+                    resultado['erro'] = str(e)
+            renomeadas += 1
+        elif resultado['resultado'] == 'ambiguo':
+            print(f"⚠ Ignorado: '{nome_antigo_arquivo}' é ambíguo. Possíveis matches: {resultado['candidatos']}")
+            ignoradas += 1
+        elif resultado['resultado'] == 'sem_palavras':
+            print(f"❌ Ignorado: '{nome_antigo_arquivo}' não contém palavras-chave úteis.")
+            ignoradas += 1
+        else:
+            print(f"❌ Ignorado: '{nome_antigo_arquivo}' não teve correspondência forte na planilha.")
+            ignoradas += 1
+
+    relatorio = {
+        'modo_teste': modo_teste, 'pasta': args.pasta, 'total_fotos': len(resultados),
+        'renomeadas': renomeadas, 'ignoradas': ignoradas,
+        'encontradas': [r for r in resultados if r['resultado'] == 'encontrado'],
+        'ambiguas': [r for r in resultados if r['resultado'] == 'ambiguo'],
+        'sem_correspondencia': [r for r in resultados if r['resultado'] in ('sem_correspondencia', 'sem_palavras')],
+    }
+    with open(args.relatorio, 'w', encoding='utf-8') as f: json.dump(relatorio, f, indent=4, ensure_ascii=False)
+
+    print("\n--- Concluído! ---")
+    if modo_teste:
+        print(">>> MODO DE TESTE ATIVADO. NENHUM ARQUIVO FOI REALMENTE RENOMEADO. <<<")
+    print(f"Arquivos que seriam renomeados: {renomeadas}")
+    print(f"Arquivos ignorados: {ignoradas}")
+    print(f"Relatório detalhado em '{args.relatorio}'.")
+    if modo_teste and renomeadas > 0:
+        print("\nSe os resultados estão corretos, mude MODO_TESTE para False e rode o script novamente.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# snapshot_partilhado.py
+"""
+Snapshot do roster partilhado entre os workers do gunicorn.
+
+O worker que monta o roster publica-o numa pasta: cada array numpy (a matriz de overalls por
+setor e as notas e médias da TabelaAtributos) vai para o seu próprio .npy, que os outros
+workers abrem com mmap (só leitura, sem cópia, as páginas ficam na cache do sistema uma única
+vez), e o resto dos registos num pickle, lido também através de mmap, que só guarda uma
+referência para cada array. Quem chega depois só desserializa, sem voltar a ler o xlsx nem a
+pontuar o roster.
+
+O ficheiro "atual.json" aponta para a última publicação: um contador de versão que só sobe
+e a assinatura do armazenamento com que o snapshot foi montado. É substituído de forma
+atómica (rename), por isso um worker lê sempre uma publicação completa; ver se mudou custa
+um stat. As publicações antigas são apagadas logo a seguir: um worker que ainda as tenha
+mapeadas continua a lê-las até largar o mapeamento.
+"""
+import json
+import mmap
+import os
+import pickle
+import re
+import threading
+
+import numpy as np
+
+from armazenamento import bloqueio_arquivo, escrever_atomico
+from metricas import medir
+
+# Arrays mais pequenos do que isto ficam dentro do pickle: não compensa um ficheiro só para eles
+MIN_BYTES_ARRAY_SEPARADO = 4096
+
+
+class _PicklerArrays(pickle.Pickler):
+    """Grava cada array numpy grande num .npy à parte e deixa no pickle só o seu índice."""
+    def __init__(self, arquivo, gravar_array):
+        super().__init__(arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        self._gravar_array = gravar_array
+        self._indices = {}  # id(array) -> índice, para um array partilhado ser gravado uma só vez
+
+    def persistent_id(self, obj):
+        if type(obj) is not np.ndarray or obj.dtype.hasobject or obj.nbytes < MIN_BYTES_ARRAY_SEPARADO: return None
+        if id(obj) not in self._indices:
+            self._indices[id(obj)] = len(self._indices)
+            self._gravar_array(self._indices[id(obj)], obj)
+        return ('npy', self._indices[id(obj)])
+
+
+class _UnpicklerArrays(pickle.Unpickler):
+    def __init__(self, arquivo, abrir_array):
+        super().__init__(arquivo)
+        self._abrir_array = abrir_array
+
+    def persistent_load(self, pid):
+        tipo, indice = pid
+        if tipo != 'npy': raise pickle.UnpicklingError(f"Referência desconhecida no snapshot: {tipo}")
+        return self._abrir_array(indice)
+
+
+class SnapshotPartilhado:
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.arquivo_atual = os.path.join(pasta, 'atual.json')
+        os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stat_atual = None
+        self._publicado = None
+
+    def _arquivo_pkl(self, versao):
+        return os.path.join(self.pasta, f'roster-{versao}.pkl')
+
+    def _arquivo_npy(self, versao, indice):
+        return os.path.join(self.pasta, f'roster-{versao}-{indice}.npy')
+
+    def versao_publicada(self):
+        """(versao, assinatura) da última publicação, ou None se ainda não há nenhuma."""
+        try:
+            st = os.stat(self.arquivo_atual)
+        except FileNotFoundError:
+            return None
+        chave_stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if chave_stat == self._stat_atual: return self._publicado
+        try:
+            with open(self.arquivo_atual, 'r', encoding='utf-8') as f: atual = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        publicado = (int(atual['versao']), atual['assinatura'])
+        with self._lock:
+            self._stat_atual, self._publicado = chave_stat, publicado
+        return publicado
+
+    def bloqueio(self):
+        """Só um processo monta e publica de cada vez; os outros esperam e carregam o resultado."""
+        return bloqueio_arquivo(self.arquivo_atual)
+
+    def carregar(self, versao):
+        """Devolve (registos, matriz de overalls) da publicação indicada, ou None se já foi apagada.
+        Os arrays vêm mapeados só para leitura."""
+        try:
+            with medir('carregar_snapshot'):
+                with open(self._arquivo_pkl(versao), 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+                    return _UnpicklerArrays(dados, lambda indice: np.load(self._arquivo_npy(versao, indice), mmap_mode='r')).load()
+        except FileNotFoundError:
+            return None
+
+    def publicar(self, assinatura, colaboradores, overalls_setores):
+        """Grava uma nova publicação e devolve a sua versão. Deve ser chamado dentro de bloqueio()."""
+        publicado = self.versao_publicada()
+        versao = publicado[0] + 1 if publicado else 1
+        def gravar_array(indice, array):
+            escrever_atomico(self._arquivo_npy(versao, indice), lambda f: np.save(f, np.ascontiguousarray(array), allow_pickle=False))
+
+        with medir('publicar_snapshot'):
+            # Os .npy são gravados durante o dump, antes do pickle que os referencia
+            escrever_atomico(self._arquivo_pkl(versao), lambda f: _PicklerArrays(f, gravar_array).dump((colaboradores, overalls_setores)))
+            conteudo = json.dumps({'versao': versao, 'assinatura': assinatura}).encode('utf-8')
+            escrever_atomico(self.arquivo_atual, lambda f: f.write(conteudo))
+        self._apagar_antigas(versao)
+        return versao
+
+    def _apagar_antigas(self, versao_atual):
+        for nome in os.listdir(self.pasta):
+            encontrado = re.fullmatch(r'roster-(\d+)(-\d+\.npy|\.pkl)', nome)
+            if not encontrado or int(encontrado.group(1)) >= versao_atual: continue
+            try:
+                os.remove(os.path.join(self.pasta, nome))
+            except OSError:
+                pass  # no Windows um ficheiro mapeado não pode ser apagado; fica para a próxima publicação
@@ -2,38 +2,48 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // --- LÓGICA PARA A TELA DE VISUALIZAÇÃO (CARDS) ---
     const selectoresDeSetor = document.querySelectorAll('.setor-selector');
+    // Overalls de todos os cards em todos os setores do seletor: {id: {setor: overall}}
+    let overallsPorSetor = {};
 
-    async function updateOverall(colaboradorId, setor) {
+    function mostrarOverall(colaboradorId, setor) {
         const overallDisplay = document.getElementById(`overall-${colaboradorId}`);
         if (!overallDisplay) return;
+        const overalls = overallsPorSetor[colaboradorId];
+        overallDisplay.textContent = overalls && setor in overalls ? overalls[setor] : 'Erro';
+    }
 
-        overallDisplay.style.opacity = '0.5';
+    async function carregarOveralls() {
+        // Um único pedido por página, com todos os ids e todos os setores das opções dos seletores
+        const ids = [...new Set([...selectoresDeSetor].map(selector => selector.dataset.colaboradorId))];
+        const setores = [...new Set([...selectoresDeSetor].flatMap(selector => [...selector.options].map(opcao => opcao.value)))];
+        const displays = ids.map(id => document.getElementById(`overall-${id}`)).filter(Boolean);
+        displays.forEach(display => { display.style.opacity = '0.5'; });
 
         try {
-            const response = await fetch(`/api/colaborador/${colaboradorId}/overall/${setor}`);
+            const parametros = new URLSearchParams({ ids: ids.join(','), setores: setores.join(',') });
+            const response = await fetch(`/api/overall_lote?${parametros}`);
             if (!response.ok) throw new Error('Erro na API');
-            
+
             const data = await response.json();
-            overallDisplay.textContent = data.overall;
+            overallsPorSetor = data.overalls;
         } catch (error) {
             console.error('Falha ao atualizar Overall:', error);
-            overallDisplay.textContent = 'Erro';
         } finally {
-            overallDisplay.style.opacity = '1';
+            selectoresDeSetor.forEach(selector => mostrarOverall(selector.dataset.colaboradorId, selector.value));
+            displays.forEach(display => { display.style.opacity = '1'; });
         }
     }
 
-    selectoresDeSetor.forEach(selector => {
-        const colaboradorId = selector.dataset.colaboradorId;
-        
-        // Calcula o Overall inicial para cada card
-        updateOverall(colaboradorId, selector.value);
+    if (selectoresDeSetor.length) {
+        carregarOveralls();
 
-        // Adiciona o evento de mudança
-        selector.addEventListener('change', function() {
-            updateOverall(colaboradorId, this.value);
+        // A mudança de setor já não precisa de ir ao servidor
+        selectoresDeSetor.forEach(selector => {
+            selector.addEventListener('change', function() {
+                mostrarOverall(this.dataset.colaboradorId, this.value);
+            });
         });
-    });
+    }
 
 
     // --- LÓGICA PARA A TELA DE AVALIAÇÃO ---